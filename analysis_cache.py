@@ -0,0 +1,92 @@
+#Importing Libraries
+import os
+import hashlib
+import pickle
+import threading
+from collections import OrderedDict
+
+from sentiment_analysis import analysis_settings
+
+#Limits for the in-process analysis result cache - can be overridden through environment variables
+CACHE_MAX_ENTRIES = int(os.environ.get("THRIVE_ANALYSIS_CACHE_ENTRIES", "128"))
+CACHE_MAX_BYTES = int(os.environ.get("THRIVE_ANALYSIS_CACHE_MB", "32")) * 1024 * 1024
+
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    #Hashes the contents of a file in chunks so identical CSVs share cache entries regardless of their temp file name
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def analysis_key(digest: str, segment=None) -> tuple:
+    #Cache key made of the CSV content hash, the segment filter (None for the whole report) and the analysis settings
+    return (digest, segment, analysis_settings())
+
+
+class AnalysisCache:
+    #Least recently used cache of analyze_reviews results, bounded by entry count and approximate memory use
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict() #key -> (result, size in bytes), oldest first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks = {} #One lock per key being computed so concurrent callbacks share a single analysis
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key) #Marks entry as most recently used
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, result):
+        size = len(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)) #Approximate memory footprint of the result
+        if size > self.max_bytes:
+            return #Never cache a result that would evict everything else
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (result, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, old_size) = self._entries.popitem(last=False) #Evicts least recently used entry
+                self._bytes -= old_size
+
+    def get_or_compute(self, key, compute):
+        result = self.get(key)
+        if result is not None:
+            return result
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock: #Only one caller runs the analysis, others wait for and reuse its result
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None:
+                return entry[0]
+            try:
+                result = compute()
+                self.put(key, result)
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+
+result_cache = AnalysisCache() #Shared by all report callbacks in this process
@@ -0,0 +1,80 @@
+// Streams the chosen csv to the /upload route as multipart form data instead of passing it through dash as base64.
+// Dash only receives the small handle the server returns (upload id, filename, row count and size).
+(function () {
+    function setProps(id, props) {
+        window.dash_clientside.set_props(id, props);
+    }
+
+    function upload(file) {
+        if (!file) {
+            return;
+        }
+        if (!file.name.toLowerCase().endsWith('.csv')) {
+            setProps('upload-prompt', {children: 'Please select a CSV file'});
+            return;
+        }
+        var form = new FormData();
+        form.append('file', file, file.name);
+        var xhr = new XMLHttpRequest();
+        xhr.open('POST', '/upload');
+        xhr.upload.onprogress = function (e) {
+            if (e.lengthComputable) {
+                setProps('upload-prompt', {children: 'Uploading ' + file.name + '... ' + Math.round(100 * e.loaded / e.total) + '%'});
+            }
+        };
+        xhr.onload = function () {
+            var body = {};
+            try {
+                body = JSON.parse(xhr.responseText);
+            } catch (err) {}
+            if (xhr.status === 200) {
+                setProps('upload-handle', {data: body});
+            } else {
+                setProps('upload-prompt', {children: 'Upload failed: ' + (body.error || xhr.statusText)});
+            }
+        };
+        xhr.onerror = function () {
+            setProps('upload-prompt', {children: 'Upload failed, please try again'});
+        };
+        setProps('upload-handle', {data: null});
+        setProps('upload-prompt', {children: 'Uploading ' + file.name + '...'});
+        xhr.send(form);
+    }
+
+    // Plain file input kept outside the dash layout - dash has no component for one
+    var picker = null;
+    function filePicker() {
+        if (!picker) {
+            picker = document.createElement('input');
+            picker.type = 'file';
+            picker.accept = '.csv';
+            picker.id = 'csv-file-input';
+            picker.style.display = 'none';
+            picker.addEventListener('change', function () {
+                upload(picker.files[0]);
+                picker.value = ''; // Choosing the same file again still fires change
+            });
+            document.body.appendChild(picker);
+        }
+        return picker;
+    }
+
+    // The upload area is rendered by a callback, so events are caught on the document
+    document.addEventListener('click', function (e) {
+        if (e.target.closest && e.target.closest('#upload-data')) {
+            e.preventDefault(); // The link inside the prompt only opens the picker
+            filePicker().click();
+        }
+    });
+    document.addEventListener('dragover', function (e) {
+        if (e.target.closest && e.target.closest('#upload-data')) {
+            e.preventDefault();
+        }
+    });
+    document.addEventListener('drop', function (e) {
+        if (e.target.closest && e.target.closest('#upload-data')) {
+            e.preventDefault();
+            upload(e.dataTransfer.files[0]);
+        }
+    });
+})();
@@ -0,0 +1,70 @@
+#Concurrency benchmark for the FastAPI backend - run from the repository root with: python -m benchmarks.bench_api_concurrency [rows]
+#Starts one large GET /csv/{filename} and measures how long small GET /csv-files requests take while it runs,
+#for the previous read_csv that parsed inside the event loop and for the current one that parses in a worker pool
+import sys
+import time
+import asyncio
+import tempfile
+import statistics
+import numpy as np
+import pandas as pd
+import httpx
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+import main
+from upload_catalog import UploadCatalog
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+SMALL_REQUESTS = 20
+
+async def old_read_csv(filename: str):
+    #Previous implementation, kept here only for comparison
+    file_path = main.os.path.join(main.UPLOAD_DIR, filename)
+    if not main.os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="File not found.")
+    df = pd.read_csv(file_path)
+    return JSONResponse(content={"columns": df.columns.tolist(), "records": df.to_dict(orient="records")})
+
+def make_csv(path: str, rows: int):
+    rng = np.random.default_rng(0)
+    pd.DataFrame({
+        "rating": rng.integers(1, 6, rows),
+        "pros": rng.choice(["Great team and flexible hours", "Good pay", "Supportive manager"], rows),
+        "cons": rng.choice(["Long shifts", "Slow promotions", "Heavy workload at month end"], rows),
+        "status": rng.choice(["Current Employee", "Former Employee"], rows)
+    }).to_csv(path, index=False)
+
+async def run(client, big_url: str):
+    #Latencies of small requests sent one after another while the big read is in flight
+    #Timed from when each one was due, so time spent waiting behind a blocked event loop is counted
+    start = time.perf_counter()
+    big = asyncio.create_task(client.get(big_url))
+    await asyncio.sleep(0.05) #Small requests are due once the big request has started
+    latencies = []
+    due = start + 0.05
+    while len(latencies) < SMALL_REQUESTS:
+        await client.get("/csv-files")
+        latencies.append(time.perf_counter() - due)
+        due = time.perf_counter()
+    small_done = time.perf_counter() - start
+    response = await big
+    assert response.status_code == 200
+    return latencies, small_done, time.perf_counter() - start
+
+async def main_async():
+    with tempfile.TemporaryDirectory() as tmp:
+        main.UPLOAD_DIR = tmp
+        main.upload_catalog = UploadCatalog(main.os.path.join(tmp, "catalog.sqlite3")) #Leaves the real catalog untouched
+        make_csv(main.os.path.join(tmp, "big.csv"), ROWS)
+        main.app.add_api_route("/old-csv/{filename}", old_read_csv, methods=["GET"])
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            print(f"{ROWS:,} row csv, {SMALL_REQUESTS} small requests during one large read")
+            for name, url in (("event loop", "/old-csv/big.csv"), ("worker pool", "/csv/big.csv")):
+                latencies, small_done, total = await run(client, url)
+                print(f"{name:<12} small p50 {statistics.median(latencies) * 1000:8.1f} ms  max {max(latencies) * 1000:8.1f} ms  "
+                      f"all small done {small_done:6.2f}s  large read {total:6.2f}s")
+
+if __name__ == "__main__":
+    asyncio.run(main_async())
@@ -0,0 +1,61 @@
+#Benchmark for rating, sentiment and employment status classification - run from the repository root with: python -m benchmarks.bench_classification
+#Compares the previous row by row apply() versions with the vectorized functions in sentiment_analysis on a synthetic review export
+import re
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from sentiment_analysis import classify_sentiment, classify_status, map_departments, map_dept
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+def make_export(rows: int) -> pd.DataFrame:
+    #Synthetic export with the value mix seen in real review files
+    rng = np.random.default_rng(0)
+    statuses = np.array(["Current Employee", "Former Employee", "current employee, more than 3 years", "Ex-employee", "Intern", None], dtype=object)
+    titles = np.array(["Software Engineer", "HR Manager", "Sales Associate", "Office Assistant", "Marketing Lead", "Accountant", "Nurse"], dtype=object)
+    return pd.DataFrame({
+        "rating": rng.integers(1, 6, rows).astype(float),
+        "status": statuses[rng.integers(0, len(statuses), rows)],
+        "title": titles[rng.integers(0, len(titles), rows)],
+    })
+
+#Previous per-row implementations, kept here only for comparison
+def old_sentiment(ratings):
+    return ratings.apply(lambda r: 'Positive' if r >= 4 else ('Neutral' if r == 3 else 'Negative'))
+
+def old_status(values):
+    def classify(x):
+        x = str(x).lower()
+        if re.search(r'\b(current|present|active)\b', x):
+            return 'Current'
+        if re.search(r'\b(former|past|previous|ex)\b', x):
+            return 'Former'
+        return 'Unknown'
+    return values.apply(classify)
+
+def old_departments(titles):
+    return titles.apply(lambda t: map_dept(str(t).lower()))
+
+def timed(fn, values):
+    start = time.perf_counter()
+    result = fn(values)
+    return time.perf_counter() - start, np.asarray(result, dtype=object)
+
+def main():
+    df = make_export(ROWS)
+    print(f"{ROWS:,} rows")
+    print(f"{'step':<12}{'apply ns/row':>14}{'vectorized ns/row':>20}{'speedup':>10}")
+    for name, old, new, col in [
+        ("sentiment", old_sentiment, classify_sentiment, "rating"),
+        ("status", old_status, classify_status, "status"),
+        ("department", old_departments, map_departments, "title"),
+    ]:
+        old_secs, old_result = timed(old, df[col])
+        new_secs, new_result = timed(new, df[col])
+        assert (old_result == new_result).all(), f"{name} results differ"
+        print(f"{name:<12}{old_secs / ROWS * 1e9:>14.1f}{new_secs / ROWS * 1e9:>20.1f}{old_secs / new_secs:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
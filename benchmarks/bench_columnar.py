@@ -0,0 +1,56 @@
+#Columnar read benchmark - run from the repository root with: python -m benchmarks.bench_columnar [rows]
+#Times reading a synthetic review export with pd.read_csv and from its memory mapped columnar copy,
+#for the whole file, a single column and a page deep into the file, and checks analyze_report gives the same result both ways
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault("THRIVE_LLM_BACKEND", "stub") #No network calls for the summaries
+import columnar_store
+from sentiment_analysis import analyze_report
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+
+def make_export(path: str, rows: int):
+    rng = np.random.default_rng(0)
+    pd.DataFrame({
+        "review_id": np.arange(rows),
+        "date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365 * 24 * 3600, rows), unit="s"),
+        "rating": rng.integers(1, 6, rows),
+        "title": rng.choice(["Software Engineer", "HR Manager", "Sales Associate", "Nurse"], rows),
+        "department": rng.choice(["Engineering", "HR", "Sales", "Care"], rows),
+        "status": rng.choice(["Current Employee", "Former Employee"], rows),
+        "pros": rng.choice(["<p>Great team and flexible hours</p>", "Good pay", "Supportive manager, good culture"], rows),
+        "cons": rng.choice(["Long shifts", "Slow promotions", "<b>Heavy workload</b> at month end"], rows)
+    }).to_csv(path, index=False)
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "export.csv")
+        make_export(path, ROWS)
+        print(f"{ROWS:,} row export, {os.path.getsize(path) / 1e6:.0f} MB csv")
+        print(f"{'conversion at ingest':<28}{timed(lambda: columnar_store.to_columnar(path)):>8.2f}s")
+        page = lambda frames: sum(len(f) for f in frames)
+        cases = [
+            ("whole file", lambda: pd.read_csv(path), lambda: columnar_store.read_columns(path)),
+            ("rating column", lambda: pd.read_csv(path, usecols=["rating"]), lambda: columnar_store.read_columns(path, ["rating"])),
+            ("1000 rows at offset 90%", lambda: page(pd.read_csv(path, skiprows=range(1, int(ROWS * 0.9)), nrows=1000) for _ in [0]),
+             lambda: page(columnar_store.iter_columns(path, offset=int(ROWS * 0.9), limit=1000)))
+        ]
+        print(f"{'':<28}{'csv':>9}{'columnar':>10}")
+        for name, csv_read, columnar_read in cases:
+            print(f"{name:<28}{timed(csv_read):>8.2f}s{timed(columnar_read):>9.3f}s")
+        columnar = analyze_report(path)
+        columnar_store.COLUMNAR_ENABLED = False
+        print("analyze_report matches pd.read_csv:", columnar == analyze_report(path))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#Schema-aware ingestion benchmark - run from the repository root with: python -m benchmarks.bench_ingestion [rows] [extra columns]
+#Writes a wide synthetic review export and measures parse time, dataframe size and peak memory of loading it
+#the previous way (every column, default dtypes) and through review_schema (needed columns, compact dtypes),
+#from the csv and from its columnar copy, then runs analyze_report on each frame and checks the results match
+#Each case runs in a fresh interpreter so peak memory is its own
+import os
+import sys
+import json
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+EXTRA = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+PROBE = """
+import os, sys, time, json
+def status_kb(key):
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith(key + ":"))
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss #Peak of the process outside linux
+os.environ["THRIVE_LLM_BACKEND"] = "stub"
+os.environ["THRIVE_COLUMNAR"] = "1" if sys.argv[2] == "columnar" else "0"
+import pandas as pd
+import columnar_store
+from sentiment_analysis import analyze_report, review_schema
+path = sys.argv[3]
+before = status_kb("VmRSS")
+start = time.perf_counter()
+df = pd.read_csv(path) if sys.argv[1] == "before" else columnar_store.read_columns(path, *review_schema(path, segments=True))
+seconds = time.perf_counter() - start
+frame_mb = df.memory_usage(deep=True).sum() / 2**20
+peak_mb = (status_kb("VmHWM") - before) / 1024 #Highest resident memory while loading, above what the imports used
+start = time.perf_counter()
+report = analyze_report(df, is_csv=False) #Same frame functions for every case, only the dtypes differ
+print(json.dumps({"seconds": seconds, "frame_mb": frame_mb, "peak_mb": peak_mb, "report_seconds": time.perf_counter() - start,
+                  "report": json.dumps(report, sort_keys=True, default=str)}))
+"""
+
+def make_export(path: str, rows: int, extra: int):
+    #Review columns plus many columns the analysis never uses, like a full survey export
+    rng = np.random.default_rng(0)
+    pros = np.array(["<p>Great team and flexible hours</p>", "Good pay", "Supportive manager, good culture", None], dtype=object)
+    cons = np.array(["Long shifts", "Slow promotions", "<b>Heavy workload</b> at month end", None], dtype=object)
+    data = {
+        "review_id": np.arange(rows),
+        "date": (pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365 * 24 * 3600, rows), unit="s")).astype(str),
+        "rating": rng.integers(1, 6, rows),
+        "job_title": rng.choice(["Software Engineer", "HR Manager", "Sales Associate", "Nurse", "Office Assistant"], rows),
+        "department": rng.choice(["Engineering", "HR", "Sales", "Care", "Admin"], rows),
+        "employment_status": rng.choice(["Current Employee", "Former Employee", "Ex-employee"], rows),
+        "pros": pros[rng.integers(0, len(pros), rows)],
+        "cons": cons[rng.integers(0, len(cons), rows)]
+    }
+    for i in range(extra):
+        data[f"extra_{i}"] = rng.random(rows) if i % 2 else rng.choice(["lorem ipsum dolor", "sit amet", "consectetur"], rows)
+    pd.DataFrame(data).to_csv(path, index=False)
+
+def measure(mode: str, source: str, path: str) -> dict:
+    out = subprocess.run([sys.executable, "-c", PROBE, mode, source, path], capture_output=True, text=True)
+    if out.returncode:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1])
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "export.csv")
+        make_export(path, ROWS, EXTRA)
+        import columnar_store
+        columnar_store.to_columnar(path) #Converted at ingest, as uploads are
+        print(f"{ROWS:,} rows x {8 + EXTRA} columns, {os.path.getsize(path) / 2**20:.0f} MB csv")
+        print(f"{'':<26}{'parse':>9}{'frame':>10}{'peak rss':>10}{'analysis':>10}")
+        results = {}
+        for mode, source in (("before", "csv"), ("after", "csv"), ("after", "columnar")):
+            r = results[(mode, source)] = measure(mode, source, path)
+            print(f"{mode + ' (' + source + ')':<26}{r['seconds']:>8.2f}s{r['frame_mb']:>8.0f}MB{r['peak_mb']:>8.0f}MB{r['report_seconds']:>9.2f}s")
+        reports = {r["report"] for r in results.values()}
+        print("analyze_report output identical:", len(reports) == 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#Benchmark for keyword extraction - run from the repository root with: python -m benchmarks.bench_keywords [rows]
+#Reports throughput in MB/s of review text for the previous join-then-count approach and the streaming engine in keywords.py
+import sys
+import time
+import string
+import numpy as np
+from collections import Counter
+
+from keywords import ANALYSIS_STOPWORDS, count_words, top_keywords
+from sentiment_analysis import clean_html_text
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+
+def make_rows(rows: int) -> list:
+    #Synthetic cleaned review cells of 5 to 30 words
+    rng = np.random.default_rng(0)
+    vocab = np.array(("management culture benefits flexible hours pay salary growth team leadership "
+                      "stress workload training career balance remote office manager communication and the "
+                      "with very good great poor long shifts, support! recognition-based onboarding").split())
+    lengths = rng.integers(5, 31, rows)
+    words = vocab[rng.integers(0, len(vocab), lengths.sum())]
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    return [" ".join(words[bounds[i]:bounds[i + 1]]) for i in range(rows)]
+
+def old_top_words(rows, n=5):
+    #Previous approach: join every row, parse the joined text again, split it into one list and count
+    text = " ".join(rows)
+    txt = clean_html_text(text).lower()
+    txt = txt.translate(str.maketrans('', '', string.punctuation))
+    words = [w for w, _ in Counter(txt.split()).most_common(200)]
+    return [w for w in words if w.isalpha() and w not in ANALYSIS_STOPWORDS][:n]
+
+def new_top_words(rows, n=5):
+    return top_keywords(count_words(rows), n, stopwords=ANALYSIS_STOPWORDS)
+
+def main():
+    rows = make_rows(ROWS)
+    megabytes = sum(len(r) + 1 for r in rows) / 1e6
+    print(f"{ROWS:,} rows, {megabytes:.1f} MB of text")
+    results = []
+    for name, fn in (("join + count", old_top_words), ("keywords.py", new_top_words)):
+        start = time.perf_counter()
+        results.append(fn(rows))
+        secs = time.perf_counter() - start
+        print(f"{name:<14}{secs:>8.2f}s{megabytes / secs:>10.1f} MB/s  {results[-1]}")
+    assert results[0] == results[1], "top keywords differ"
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+#Benchmark for the pdf chart backends - run from the repository root with: python -m benchmarks.bench_pdf_charts [departments]
+#Builds the same synthetic report with matplotlib png charts and with reportlab vector charts, and prints build time and pdf size
+import sys
+import time
+
+from generate_report import build_report_pdf
+
+DEPARTMENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+
+def make_report(departments: int) -> dict:
+    #Report artifact shaped like analyze_report's output, with different counts per section so no chart is reused
+    def result(i):
+        return {
+            "overall_sentiment_counts": {"Positive": 40 + i, "Neutral": 10 + i % 7, "Negative": 20 + i % 11},
+            "pros_summary": "Employees value the flexible hours and supportive team.",
+            "cons_summary": "Workload and communication from management could improve.",
+            "key_pros": [{"title": "Flexibility", "description": "Hours can be arranged around personal commitments."}],
+            "key_cons": [{"title": "Workload", "description": "Busy periods stretch teams thin."}]
+        }
+    return {
+        "overall": result(0),
+        "departments": {f"Department {i}": result(i) for i in range(1, departments + 1)},
+        "statuses": {"Current": result(departments + 1), "Former": result(departments + 2)}
+    }
+
+def main():
+    report = make_report(DEPARTMENTS)
+    print(f"{DEPARTMENTS + 3} charts")
+    for backend in ("matplotlib", "reportlab"):
+        start = time.perf_counter()
+        pdf = build_report_pdf(report, "January 01, 2025", backend)
+        secs = time.perf_counter() - start
+        print(f"{backend:<12}{secs:>8.2f}s{len(pdf) / 1024:>10.0f} KB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#Startup benchmark - run from the repository root with: python -m benchmarks.bench_startup [module ...]
+#Imports each module in a fresh interpreter and prints its import time, resident memory added, and the heavy libraries it pulled in
+import sys
+import json
+import subprocess
+
+MODULES = sys.argv[1:] or [
+    "master", "home_page", "generate_report", "sentiment_analysis", "report_artifact",
+    "report_charts", "report_meta", "login_page", "register_page"
+]
+HEAVY = ["matplotlib", "plotly.express", "reportlab.platypus", "bs4", "lxml", "google.generativeai", "google.cloud.firestore", "google.cloud.storage"]
+
+PROBE = """
+import sys, time, json, importlib
+def rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss #Peak rather than current outside linux
+before = rss_kb()
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+seconds = time.perf_counter() - start
+print(json.dumps({"seconds": seconds, "rss_mb": (rss_kb() - before) / 1024,
+                  "loaded": [m for m in json.loads(sys.argv[2]) if m in sys.modules]}))
+"""
+
+def measure(module: str) -> dict:
+    #Fresh interpreter per module so nothing is already imported
+    out = subprocess.run([sys.executable, "-c", PROBE, module, json.dumps(HEAVY)], capture_output=True, text=True)
+    if out.returncode:
+        return {"error": out.stderr.strip().splitlines()[-1]}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    print(f"{'module':<20}{'import':>10}{'rss':>10}  heavy libraries loaded")
+    for module in MODULES:
+        r = measure(module)
+        if "error" in r:
+            print(f"{module:<20}  failed: {r['error']}")
+            continue
+        print(f"{module:<20}{r['seconds']:>9.2f}s{r['rss_mb']:>8.0f}MB  {', '.join(r['loaded']) or '-'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#Upload listing benchmark - run from the repository root with: python -m benchmarks.bench_upload_catalog [uploads]
+#Fills a temporary upload directory and catalog with the given number of small csvs, then times one page of
+#GET /csv-files the old way (scan the directory, open every file for its size and header) and from the catalog
+import os
+import sys
+import time
+import tempfile
+import statistics
+
+from upload_catalog import UploadCatalog, CsvStats, SORT_COLUMNS
+
+UPLOADS = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+REPEATS = 5
+
+def scan_directory(directory: str, limit: int = 100) -> list:
+    #Directory listing with the same metadata as the catalog - what a sorted, filtered list needs without one
+    items = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".csv"):
+            with open(entry.path, "rb") as f:
+                header = f.readline()
+            items.append((entry.stat().st_mtime, entry.name, entry.stat().st_size, header))
+    items.sort(reverse=True)
+    return items[:limit]
+
+def timed(fn) -> float:
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog = UploadCatalog(os.path.join(tmp, "catalog.sqlite3"))
+        conn = catalog._connect()
+        conn.execute("BEGIN")
+        for i in range(UPLOADS):
+            name = f"{i:032x}_reviews_{i % 997}.csv"
+            data = f"rating,pros,cons\n{i % 5 + 1},good,bad\n".encode()
+            with open(os.path.join(tmp, name), "wb") as f:
+                f.write(data)
+            stats = CsvStats()
+            stats.update(data)
+            catalog.add(name, name.split("_", 1)[1], stats, 1_700_000_000 + i)
+        conn.execute("COMMIT")
+        print(f"{UPLOADS:,} uploads, median of {REPEATS} runs, first page of 100")
+        print(f"{'directory scan':<32}{timed(lambda: scan_directory(tmp)):>10.1f} ms")
+        for sort in SORT_COLUMNS:
+            print(f"{'catalog sort=' + sort:<32}{timed(lambda: catalog.query(sort)):>10.1f} ms")
+        deep = UPLOADS // 2
+        print(f"{f'catalog offset={deep}':<32}{timed(lambda: catalog.query(offset=deep)):>10.1f} ms")
+        print(f"{'catalog q=reviews_42':<32}{timed(lambda: catalog.query(name='reviews_42.')):>10.1f} ms")
+        print(f"{'catalog min_rows=1':<32}{timed(lambda: catalog.query(min_rows=1)):>10.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#Importing Libraries
+import os
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+#Settings for the local copy of firebase storage objects - can be overridden through environment variables
+BLOB_CACHE_DIR = os.environ.get("THRIVE_BLOB_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "blobs"))
+BLOB_CACHE_MAX_BYTES = int(os.environ.get("THRIVE_BLOB_CACHE_MB", "1024")) * 1024 * 1024 #Disk quota
+BLOB_MEMORY_MAX_BYTES = int(os.environ.get("THRIVE_BLOB_MEMORY_MB", "64")) * 1024 * 1024 #In-memory quota for get_bytes
+
+
+class BlobCache:
+    #Local cache of storage objects keyed by storage path and object generation (or md5)
+    #An object that has not changed is served from disk or memory without downloading it again
+    def __init__(self, root: str = BLOB_CACHE_DIR, max_bytes: int = BLOB_CACHE_MAX_BYTES,
+                 memory_max_bytes: int = BLOB_MEMORY_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.memory_max_bytes = memory_max_bytes
+        self._memory = OrderedDict() #key -> bytes, least recently used first
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def version(blob, generation=None) -> str:
+        #Object generation recorded when it was uploaded avoids a round trip, otherwise only the metadata is fetched
+        if generation:
+            return str(generation)
+        blob.reload()
+        return str(blob.generation or blob.md5_hash)
+
+    def key(self, blob, generation=None) -> str:
+        return hashlib.sha256(f"{blob.name}@{self.version(blob, generation)}".encode("utf-8")).hexdigest()
+
+    def _local_path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def path(self, blob, generation=None) -> str:
+        #Local file holding the object's contents - downloaded only when this version is not cached yet
+        local = self._local_path(self.key(blob, generation))
+        if os.path.exists(local):
+            os.utime(local) #Marks the file as recently used for eviction
+            return local
+        os.makedirs(os.path.dirname(local), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(local), suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                blob.download_to_file(f)
+            os.replace(tmp, local) #Atomic, other workers never see a half written file
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.evict()
+        return local
+
+    def get_bytes(self, blob, generation=None) -> bytes:
+        #Object contents from memory, falling back to the disk cache
+        generation = self.version(blob, generation) #Looked up once and reused for the disk cache below
+        key = self.key(blob, generation)
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+        with open(self.path(blob, generation), "rb") as f:
+            data = f.read()
+        if len(data) <= self.memory_max_bytes:
+            with self._lock:
+                if key not in self._memory:
+                    self._memory[key] = data
+                    self._memory_bytes += len(data)
+                while self._memory_bytes > self.memory_max_bytes:
+                    _, old = self._memory.popitem(last=False)
+                    self._memory_bytes -= len(old)
+        return data
+
+    def evict(self):
+        #Deletes least recently used files until the cache fits its disk quota
+        files = []
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(".part"):
+                    continue #Download in progress
+                full = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(full)
+                except FileNotFoundError:
+                    continue #Removed by another worker
+                files.append((st.st_mtime, st.st_size, full))
+        total = sum(size for _, size, _ in files)
+        for _, size, full in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(full)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+blob_cache = BlobCache() #Shared by every storage download in this process
@@ -0,0 +1,186 @@
+#Importing Libraries
+import os
+import re
+import tempfile
+import threading
+import importlib.util
+import numpy as np
+import pandas as pd
+
+#Settings for the columnar copies of uploaded csvs - can be overridden through environment variables
+COLUMNAR_ENABLED = os.environ.get("THRIVE_COLUMNAR", "1") != "0" and importlib.util.find_spec("pyarrow") is not None #pyarrow is optional, csvs are parsed with pandas without it
+COLUMNAR_SUFFIX = ".arrow" #Arrow IPC file (feather v2), uncompressed so it can be memory mapped
+COLUMNAR_BLOCK_BYTES = int(os.environ.get("THRIVE_COLUMNAR_BLOCK_MB", "4")) * 1024 * 1024 #Csv bytes converted at a time
+NULL_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>', 'N/A',
+               'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'] #Same missing value markers as pd.read_csv
+SOURCE_KEY = b"thrive.source" #Schema metadata naming the csv a file was converted from
+
+_locks = {} #Csv path -> lock, so a file is converted once however many readers ask for it
+_locks_lock = threading.Lock()
+_failed = set() #Csvs that cannot be converted, read with pandas without trying again
+
+
+def columnar_path(csv_path: str) -> str:
+    #Columnar copy stored next to the csv
+    return csv_path + COLUMNAR_SUFFIX
+
+def source_tag(csv_path: str) -> bytes:
+    #Identifies the csv a copy was made from - size and inode, since the blob cache bumps mtime on every use
+    st = os.stat(csv_path)
+    return f"{st.st_size}:{st.st_ino}".encode()
+
+def _open(path: str):
+    import pyarrow as pa
+    return pa.ipc.open_file(pa.memory_map(path, "r")) #Pages are read from disk only when a column is used
+
+def _is_current(csv_path: str, path: str) -> bool:
+    try:
+        metadata = _open(path).schema.metadata or {}
+    except Exception: #Missing or unreadable copy
+        return False
+    return metadata.get(SOURCE_KEY) == source_tag(csv_path)
+
+def _column_types(csv_path: str) -> dict:
+    #Types pyarrow infers from the first block, limited to the ones pd.read_csv would produce
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    reader = pacsv.open_csv(csv_path, read_options=pacsv.ReadOptions(block_size=COLUMNAR_BLOCK_BYTES),
+                            convert_options=pacsv.ConvertOptions(null_values=NULL_VALUES, strings_can_be_null=True))
+    names = reader.schema.names
+    if len(set(names)) != len(names) or not all(names):
+        raise ValueError("Duplicate or empty column names") #pandas renames these, the columnar copy would not match
+    types = {}
+    for field in reader.schema:
+        if pa.types.is_integer(field.type) or pa.types.is_floating(field.type) or pa.types.is_boolean(field.type):
+            types[field.name] = field.type
+        else:
+            types[field.name] = pa.string() #Dates stay text like pandas reads them, empty columns can hold text later on
+    reader.close()
+    return types
+
+def _widen(types: dict, error: Exception) -> bool:
+    #A later block did not fit the inferred type - int becomes float, then text, the same way pandas would read the column
+    import pyarrow as pa
+    match = re.search(r"In CSV column #(\d+)", str(error))
+    if not match:
+        return False
+    name = list(types)[int(match.group(1))]
+    if pa.types.is_integer(types[name]):
+        types[name] = pa.float64()
+    elif not pa.types.is_string(types[name]):
+        types[name] = pa.string()
+    else:
+        return False
+    return True
+
+def _convert(csv_path: str, path: str):
+    #Streams the csv into an Arrow IPC file one block at a time, so memory stays flat however large the csv is
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    types = _column_types(csv_path)
+    while True:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".part")
+        os.close(fd)
+        try:
+            reader = pacsv.open_csv(csv_path, read_options=pacsv.ReadOptions(block_size=COLUMNAR_BLOCK_BYTES),
+                                    convert_options=pacsv.ConvertOptions(column_types=types, null_values=NULL_VALUES, strings_can_be_null=True))
+            schema = reader.schema.with_metadata({SOURCE_KEY: source_tag(csv_path)})
+            with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+                for batch in reader:
+                    writer.write_batch(batch)
+            os.replace(tmp, path) #Atomic, readers never see a half written file
+            return
+        except pa.ArrowInvalid as e:
+            os.remove(tmp)
+            if not _widen(types, e):
+                raise
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+def to_columnar(csv_path: str):
+    #Path of the csv's columnar copy, converting it the first time - None when pyarrow is missing or the csv cannot be converted
+    if not COLUMNAR_ENABLED or csv_path in _failed:
+        return None
+    path = columnar_path(csv_path)
+    with _locks_lock:
+        lock = _locks.setdefault(csv_path, threading.Lock())
+    with lock:
+        if _is_current(csv_path, path):
+            return path
+        try:
+            _convert(csv_path, path)
+        except Exception:
+            _failed.add(csv_path) #Malformed or unusual csv - pandas reads it as before
+            return None
+    return path
+
+def csv_columns(csv_path: str) -> list:
+    #Header of the csv, from the columnar schema when there is a copy
+    path = to_columnar(csv_path)
+    if path is None:
+        return pd.read_csv(csv_path, nrows=0).columns.tolist()
+    return _open(path).schema.names
+
+def _frame(table, dtype=None) -> pd.DataFrame:
+    #Dataframe of an arrow table with the requested dtypes applied on the arrow side, so no python strings are built for them
+    import pyarrow as pa
+    dtype = dtype or {}
+    for name, kind in dtype.items():
+        i = table.schema.get_field_index(name)
+        if i < 0:
+            continue
+        column = table.column(i)
+        if kind == "category" and not pa.types.is_dictionary(column.type):
+            column = column.dictionary_encode() #Becomes a pandas categorical
+        elif kind not in ("category", "string[pyarrow]", "object") and (pa.types.is_integer(column.type) or pa.types.is_floating(column.type)):
+            column = column.cast(pa.from_numpy_dtype(np.dtype(kind))) #Compact numbers, text columns are left for the caller to convert
+        table = table.set_column(i, name, column)
+    mapper = {pa.string(): pd.StringDtype("pyarrow")}.get if "string[pyarrow]" in dtype.values() else None #Arrow backed strings share the arrow buffers
+    return table.to_pandas(split_blocks=True, types_mapper=mapper) #One block per column, no consolidation copy
+
+def _text_dtypes(dtype):
+    return {k: v for k, v in (dtype or {}).items() if v in ("category", "string[pyarrow]", "object")} or None
+
+def _read_csv(csv_path: str, columns=None, dtype=None):
+    #pd.read_csv with the requested dtypes - numeric ones are dropped if a value further down the file is not a number
+    try:
+        return pd.read_csv(csv_path, usecols=columns, dtype=dtype)
+    except (ValueError, TypeError):
+        if not dtype:
+            raise
+        return pd.read_csv(csv_path, usecols=columns, dtype=_text_dtypes(dtype))
+
+def read_columns(csv_path: str, columns=None, dtype=None) -> pd.DataFrame:
+    #Whole csv, or only the given columns, as a dataframe - only the pages of those columns are read from the memory map
+    path = to_columnar(csv_path)
+    if path is None:
+        return _read_csv(csv_path, columns, dtype)
+    table = _open(path).read_all()
+    return _frame(table.select(columns) if columns else table, dtype)
+
+def iter_columns(csv_path: str, columns=None, rows: int = 50000, offset: int = 0, limit: int = None, dtype=None):
+    #Rows offset to offset + limit in dataframes of at most rows rows - rows before the offset are skipped without parsing
+    path = to_columnar(csv_path)
+    if path is None:
+        remaining = limit
+        for chunk in pd.read_csv(csv_path, usecols=columns, dtype=_text_dtypes(dtype), chunksize=rows): #A chunk cannot be parsed again, numbers keep their inferred type
+            if offset >= len(chunk):
+                offset -= len(chunk) #Rows before the page are parsed and dropped, never kept
+                continue
+            chunk = chunk.iloc[offset:]
+            offset = 0
+            if remaining is not None:
+                chunk = chunk.iloc[:remaining]
+                remaining -= len(chunk)
+            yield chunk[columns] if columns else chunk #Keeps the requested column order
+            if remaining is not None and remaining <= 0:
+                return
+        return
+    table = _open(path).read_all()
+    if columns:
+        table = table.select(columns)
+    end = table.num_rows if limit is None else min(table.num_rows, offset + limit)
+    for start in range(offset, end, rows):
+        yield _frame(table.slice(start, min(rows, end - start)), dtype) #Slices are zero copy views of the memory map
@@ -0,0 +1,81 @@
+#Importing Libraries
+import os
+import re
+import tempfile
+from flask import jsonify, request
+from werkzeug.formparser import parse_form_data
+from upload_catalog import CsvStats, upload_catalog
+
+UPLOAD_DIR = "uploads" #Uploaded csvs, stored under their sha256 so the same file is kept once
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+MAX_UPLOAD_BYTES = int(os.environ.get("THRIVE_UPLOAD_MAX_MB", "2048")) * 1024 * 1024
+UPLOAD_ID = re.compile(r"^[0-9a-f]{64}$")
+
+
+class CsvSink:
+    #File object werkzeug streams an uploaded part into - writes to disk while hashing and counting csv records
+    #Only the current chunk is ever held in memory, whatever the size of the upload
+    def __init__(self, directory: str = UPLOAD_DIR):
+        fd, self.path = tempfile.mkstemp(dir=directory, suffix=".part")
+        self._file = os.fdopen(fd, "w+b")
+        self.stats = CsvStats() #Hash, size and record count kept while writing
+
+    def write(self, data: bytes):
+        if self.stats.bytes + len(data) > MAX_UPLOAD_BYTES:
+            raise ValueError(f"Upload is larger than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+        self._file.write(data)
+        self.stats.update(data)
+
+    def seek(self, offset: int, whence: int = 0):
+        return self._file.seek(offset, whence)
+
+    def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+    def close(self):
+        self._file.close()
+
+    def discard(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def finish(self, filename: str) -> dict:
+        #Moves the finished upload to its content addressed path and returns the handle given to dash
+        self.close()
+        digest = self.stats.sha256
+        path = upload_path(digest)
+        os.replace(self.path, path) #Same content uploaded twice ends up in the same file
+        upload_catalog.add(os.path.basename(path), filename, self.stats) #Listed by GET /csv-files like the api's own uploads
+        return {"upload_id": digest, "filename": filename, "rows": self.stats.rows, "bytes": self.stats.bytes}
+
+
+def upload_path(upload_id: str) -> str:
+    #Local path of an uploaded csv from its handle - rejects anything that is not a sha256
+    if not UPLOAD_ID.match(str(upload_id)):
+        raise ValueError("Invalid upload id")
+    return os.path.join(UPLOAD_DIR, f"{upload_id}.csv")
+
+def register_routes(server):
+    #Multipart csv upload endpoint on the dash flask server - POST /upload with the csv in a "file" field
+    def upload_csv():
+        sinks = []
+        def stream_factory(total_content_length, content_type, filename, content_length=None):
+            sinks.append(CsvSink())
+            return sinks[-1]
+        try:
+            _, _, files = parse_form_data(request.environ, stream_factory=stream_factory, silent=False)
+            part = files.get("file")
+            if part is None or not part.filename:
+                return jsonify({"error": "No file uploaded"}), 400
+            if not part.filename.lower().endswith(".csv"):
+                return jsonify({"error": "Only CSV files are allowed"}), 400
+            sink = part.stream
+            sinks.remove(sink)
+            return jsonify(sink.finish(os.path.basename(part.filename)))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 413
+        finally:
+            for sink in sinks:
+                sink.discard() #Parts other than the csv, or an upload that failed part way
+    server.add_url_rule("/upload", "upload_csv", upload_csv, methods=["POST"])
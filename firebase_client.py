@@ -0,0 +1,40 @@
+#Importing Libraries
+import os
+import threading
+
+#Firebase project settings - can be overridden through environment variables
+FIREBASE_KEY = os.environ.get("THRIVE_FIREBASE_KEY", "firebase_key.json")
+STORAGE_BUCKET = os.environ.get("THRIVE_STORAGE_BUCKET", "angaraithrive.firebasestorage.app")
+
+_app_lock = threading.Lock()
+
+
+def firebase_app():
+    #Initializes Firebase Admin the first time any client is needed, instead of when the app is imported
+    import firebase_admin
+    with _app_lock:
+        try:
+            return firebase_admin.get_app()
+        except ValueError: #No default app yet
+            from firebase_admin import credentials
+            return firebase_admin.initialize_app(credentials.Certificate(FIREBASE_KEY), {
+                'storageBucket': STORAGE_BUCKET
+            })
+
+def firestore_client():
+    #Firestore client of the default app - firebase admin keeps one per app
+    firebase_app()
+    from firebase_admin import firestore #Loads the grpc firestore library on first use
+    return firestore.client()
+
+def storage_bucket():
+    #Default storage bucket of the app
+    firebase_app()
+    from firebase_admin import storage
+    return storage.bucket()
+
+def firebase_auth():
+    #Firebase auth module, with the app initialized for its calls
+    firebase_app()
+    from firebase_admin import auth
+    return auth
@@ -1,41 +1,29 @@
 # Importing libraries  #Importing libraries
-import tempfile
+import os
+import json
+import hashlib
 import datetime
-import matplotlib
-matplotlib.use('Agg') #Helps rendering the pie chart
-import matplotlib.pyplot as plt
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from dash import dcc, html, Input, Output, State
 from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
-import plotly.express as px
 
-from sentiment_analysis import analyze_reviews, clean_html_text
-from firebase_admin import firestore, storage
-import pandas as pd
-import string
-from collections import Counter
-
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Image, Spacer, ListFlowable, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.pagesizes import letter
+from sentiment_analysis import analyze_reviews, analyze_report
+from analysis_cache import result_cache, analysis_key, file_digest
+from report_artifact import artifact_path, artifact_current, build_artifact, save_artifact, load_artifact
+from blob_cache import blob_cache
+from report_charts import CHART_BACKEND, chart_flowables #Loads reportlab and matplotlib only when a pdf is built
+from report_meta import latest_report
+from firebase_client import storage_bucket, firestore_client
+from columnar_store import read_columns
 from io import BytesIO
 
-def top_words(text):
-    txt = clean_html_text(text).lower()
-    txt = txt.translate(str.maketrans('', '', string.punctuation)) #removes punctuation
-    stopwords = {"and","the","for","with","are","not","but","all","was","were","very","just","really",
-                 "have","has","had","you","your","our","their","this","that","those","these",
-                 "none","n/a","na","yes","out","too","they","i","we","on","in","of","to","at","from",
-                 "great","good","excellent","amazing","awesome","nice",
-                 "supportive","friendly","helpful","long","lack",
-                 "job","work","company","many","some","one","well","lot","lots","make","makes","there","its","etc",
-                 "employees","employee",
-                 "minor","issue","issues","problem","problems",
-                 "sometimes","often","better","major","could","working","lacking","high","low","inadequate",
-                 "more","less","bad","poor","unfortunately"}
-    words = [w for w in txt.split() if len(w) > 2 and w not in stopwords] #Extracting top most common key words from any geiven text excluding the stopwords
-    return [w for w, _ in Counter(words).most_common(5)] #5 most common words
+PDF_VERSION = 1 #Bumped whenever the pdf layout changes, so stored pdfs are rebuilt
+pdf_pool = ThreadPoolExecutor(max_workers=int(os.environ.get("THRIVE_PDF_WORKERS", "2")), thread_name_prefix="pdf") #Builds pdfs off the callback threads
+_pdf_jobs = {} #Report document id -> future of the build in progress
+_pdf_lock = threading.Lock()
 
 #Converting list of strings into readable sets of sentences
 def list_to_text(lst):
@@ -47,6 +35,165 @@ def list_to_text(lst):
         return f"{lst[0]} and {lst[1]}"
     return ", ".join(lst[:-1]) + f", and {lst[-1]}"
 
+#Runs the single pass report engine once per CSV, concurrent callbacks share the same run
+def cached_report(csv_path, digest):
+    return result_cache.get_or_compute(analysis_key(digest, 'report'), lambda: analyze_report(csv_path))
+
+#Latest report document from firebase, None when no report exists yet - served from the process wide metadata cache
+def latest_report_doc():
+    return latest_report.get()
+
+#Local path of the report's csv - downloaded from firestore storage only when the cached copy is missing or outdated
+def download_report_csv(meta):
+    return blob_cache.path(storage_bucket().blob(meta["storage_path"]), meta.get("storage_generation"))
+
+#Loads the precomputed aggregate artifact of a report - reports created before artifacts existed, or whose artifact is outdated, get one built and stored once
+def report_artifact(doc):
+    meta = doc.to_dict()
+    bucket = storage_bucket()
+    if meta.get("summary_path"):
+        artifact = load_artifact(bucket, meta["summary_path"], meta.get("summary_generation"))
+        if artifact_current(artifact):
+            return artifact
+    csv_path = download_report_csv(meta)
+    artifact = build_artifact(csv_path, cached_report(csv_path, file_digest(csv_path)))
+    path = artifact_path(meta["storage_path"])
+    generation = save_artifact(bucket, path, artifact)
+    doc.reference.update({"summary_path": path, "summary_generation": generation}) #Later visits load the artifact instead of the csv
+    latest_report.invalidate()
+    return artifact
+
+#Pie chart labels and colors shared by the report pages and the pdf
+labels = ['Positive', 'Neutral', 'Negative']
+colors = ['#63FF70', '#FFBF00', '#FF2A2A']  # hex code for amber inserted
+
+#Date and time of the latest review in the report, used as the report's generation date
+def report_datetime(meta):
+    ts_val = meta.get("timestamp") 
+    if isinstance(ts_val, str): 
+        try:  
+            return datetime.datetime.strptime(ts_val, "%Y-%m-%d_%H-%M-%S")  # Date and time stamp of latest review
+        except Exception:  
+            return datetime.datetime.now()  #if no date or time stamp is found, uses current date
+    elif ts_val:  
+        return ts_val.to_datetime() if hasattr(ts_val, 'to_datetime') else ts_val  #looks for datatypes that can be converted to date-time
+    return datetime.datetime.now()  # Uses current date and time as exception
+
+#Plotly pie chart of the sentiment distribution shown on the report pages
+def sentiment_figure(values, title, font_size=16):
+    import plotly.express as px #Imported on first render so workers start without plotly
+    fig = px.pie(
+        names=labels,
+        values=values,
+        title=title,
+        color=labels,
+        color_discrete_map=dict(zip(labels, colors))
+    )
+    fig.update_traces(textinfo='percent+label', textfont=dict(size=font_size, family="Arial Black"))
+    fig.update_layout(margin=dict(t=50, b=50, l=50, r=50), paper_bgcolor = "#cbe5ff")
+    return fig
+
+#Adds the pie chart, summaries, and key pros and cons with descriptions of one result to the pdf story
+def add_result_section(story, result, chart, styles):
+    from reportlab.platypus import Paragraph, Spacer, ListFlowable
+    story.append(chart) #Adds the pie chart
+    story.append(Spacer(1, 12))
+    story.append(Paragraph("Pros", styles['Heading2'])) #Pros Header
+    story.append(Paragraph(result.get('pros_summary', ''), styles['BodyText'])) #Pros Summary
+    #Loops through the list of pros in key_pros and add corresponding descriptions as a bullet point style list to the pdf
+    for p in result.get('key_pros', []):
+        title = p.get('title', '') 
+        desc = p.get('description', '').strip().lower().capitalize()
+        story.append(ListFlowable([Paragraph(f"<b>{title}</b>: {desc}", styles['BodyText'])], bulletType='bullet', leftIndent=20))
+    story.append(Spacer(1, 6))
+    story.append(Paragraph("Areas for Improvement", styles['Heading2'])) #Repeats steps for cons
+    story.append(Paragraph(result.get('cons_summary', ''), styles['BodyText']))
+    for c in result.get('key_cons', []):
+        title = c.get('title', '')
+        desc = c.get('description', '').strip().lower().capitalize()
+        story.append(ListFlowable([Paragraph(f"<b>{title}</b>: {desc}", styles['BodyText'])], bulletType='bullet', leftIndent=20))
+
+#Builds the report pdf - overall sentiment, then one page per department and per job status
+def build_report_pdf(report, date_str, chart_backend=CHART_BACKEND):
+    #(page heading, chart title, result) for every section, so all charts can be rendered together
+    sections = [(None, "Overall Sentiment", report['overall'])]
+    sections += [(f"Department: {dept}", f"{dept} Sentiment", r) for dept, r in report['departments'].items()]
+    sections += [(f"Status: {status}", f"{status} Employee Sentiment", r) for status, r in report['statuses'].items()]
+    charts = chart_flowables(
+        [([r.get('overall_sentiment_counts', {}).get(l, 0) for l in labels], title) for _, title, r in sections],
+        labels, colors, chart_backend
+    ) #Vector drawings, or pngs rendered across processes for reports with many departments
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak #Imported when the first pdf is built
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.pagesizes import letter
+
+    styles = getSampleStyleSheet() #Prepares default style, title, subtitle, and body styles
+    story = [] #Starts list where pdf will be generated onto
+    story.append(Paragraph("Sentiment Analysis Report", styles['Heading1'])) #Adds text sentiment analysis
+    story.append(Paragraph(f"Generated on {date_str}", styles['Heading2'])) #Adds date
+    story.append(Spacer(1, 12)) #Spacing between elements with format of - horizontal, vertical 
+    for (heading, _, result), chart in zip(sections, charts):
+        if heading:
+            story.append(PageBreak())
+            story.append(Paragraph(heading, styles['Heading2']))
+            story.append(Spacer(1, 12))
+        add_result_section(story, result, chart, styles)
+
+    buffer = BytesIO() #Bytes buffer the pdf is built into
+    SimpleDocTemplate(buffer, pagesize=letter).build(story) #Uses reportlabs to build the story into a pdf
+    return buffer.getvalue()
+
+#Hash of everything that ends up in the pdf - equal hashes mean an identical pdf
+def pdf_content_hash(artifact, date_str, chart_backend):
+    content = json.dumps({"version": PDF_VERSION, "date": date_str, "charts": chart_backend, "artifact": artifact}, sort_keys=True)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+#Builds and uploads the pdf of a report unless a pdf with the same content is already in storage, then records it on the report document
+def publish_report_pdf(doc_ref):
+    doc = doc_ref.get()
+    meta = doc.to_dict()
+    artifact = report_artifact(doc)
+    date_str = report_datetime(meta).strftime('%B %d, %Y')
+    chart_backend = meta.get("chart_backend") or CHART_BACKEND #A report document can pick its own chart backend
+    content_hash = pdf_content_hash(artifact, date_str, chart_backend)
+    pdf_path = f"reports/pdf/{content_hash}.pdf" #Named by content, so the same report never produces a second object
+    if meta.get("pdf_hash") == content_hash:
+        return pdf_path, meta.get("pdf_generation") #Built before - nothing to do
+
+    from google.api_core.exceptions import NotFound, PreconditionFailed
+    bucket = storage_bucket()
+    blob = bucket.blob(pdf_path)
+    if not blob.exists():
+        try:
+            blob.upload_from_string(build_report_pdf(artifact['report'], date_str, chart_backend), content_type='application/pdf', if_generation_match=0)
+        except PreconditionFailed:
+            pass #Another worker uploaded the same pdf first
+    blob.reload()
+    old_path = meta.get("pdf_path")
+    doc_ref.update({"pdf_path": pdf_path, "pdf_hash": content_hash, "pdf_generation": blob.generation})
+    latest_report.invalidate()
+    if old_path and old_path != pdf_path and not pdf_referenced(old_path):
+        try:
+            bucket.blob(old_path).delete() #Pdf of an older build, or timestamped from before pdfs were named by content
+        except NotFound:
+            pass
+    return pdf_path, blob.generation
+
+#Whether any report document still points at a stored pdf - identical reports share one content addressed pdf
+def pdf_referenced(pdf_path):
+    query = firestore_client().collection("reports").where("pdf_path", "==", pdf_path).limit(1)
+    return next(iter(query.stream()), None) is not None
+
+#Future for the report's stored pdf (path, generation) - concurrent requests for the same report share one build
+def report_pdf(doc_ref):
+    with _pdf_lock:
+        future = _pdf_jobs.get(doc_ref.id)
+        if future is None:
+            future = pdf_pool.submit(publish_report_pdf, doc_ref)
+            _pdf_jobs[doc_ref.id] = future
+            future.add_done_callback(lambda f: _pdf_jobs.pop(doc_ref.id, None))
+        return future
+
 tabs_style = {'borderBottom': 'none'}
 tab_style = {
     'border': 'none',
@@ -66,33 +213,12 @@ tab_selected_style = {
 
 #Setting layout for the report
 def report_layout():
-    db = firestore.client() #Calling firebase database and saving the client call in ædb'
-    bucket = storage.bucket() #Calling firestore storage and saving the bucket details in 'bucket'
-
-    #fetching data of latest report 
-    docs = (
-        db.collection("reports")
-          .order_by("timestamp", direction=firestore.Query.DESCENDING)
-          .limit(1)
-          .stream()
-    )
-
-    try:
-        meta = next(docs).to_dict() #Converting the report metadata to a dictionary
-    except StopIteration:
+    doc = latest_report_doc() #fetching data of latest report 
+    if doc is None:
         return html.Div("No report found.", className="p-4", style={"backgroundColor": "#FFFFFF", "minHeight": "100vh"})  #When report does not exist and hence cannot be converted to dictionary
+    meta = doc.to_dict() #Converting the report metadata to a dictionary
 
-    #Determines display date and time from latest review timestamp 
-    ts_val = meta.get("timestamp") 
-    if isinstance(ts_val, str): 
-        try:  
-            last_dt = datetime.datetime.strptime(ts_val, "%Y-%m-%d_%H-%M-%S")  # Date and time stamp of latest review
-        except Exception:  
-            last_dt = datetime.datetime.now()  #if no date or time stamp is found, uses current date
-    elif ts_val:  
-        last_dt = ts_val.to_datetime() if hasattr(ts_val, 'to_datetime') else ts_val  #looks for datatypes that can be converted to date-time
-    else:  
-        last_dt = datetime.datetime.now()  # Uses current date and time as exception
+    last_dt = report_datetime(meta) #Determines display date and time from latest review timestamp
 
     return html.Div([
         dbc.Row([
@@ -138,34 +264,17 @@ def register_callbacks(app):
         allow_duplicate=True
     )
     def render_tab(tab):
-        db = firestore.client()
-        bucket = storage.bucket()
-
-        #Fetches latest report from firebase
-        docs = (
-            db.collection("reports")
-              .order_by("timestamp", direction=firestore.Query.DESCENDING)
-              .limit(1)
-              .stream()
-        )
-        try:
-            doc = next(docs) #Fetches next detail from the report in docs so details are fetched one at a time 
-            #Done to prevent them all loading onto the memory at the same time 
-        except StopIteration:
-            raise PreventUpdate #When docs is fully scanned through, no change happen
-
-        meta = doc.to_dict() #Converts the details to a dictionary
-        blob = bucket.blob(meta["storage_path"]) #returns storage path of the report refered to by doc
-        tmp = tempfile.NamedTemporaryFile(suffix=".csv", delete=False) #Creates a temporary csv
-        blob.download_to_filename(tmp.name) #Downloads the contents of the firestore storage file onto the csv
-        df = pd.read_csv(tmp.name) #pandas dataframe for the csv
-        result = analyze_reviews(tmp.name) #Runs analyze_reviews function from sentiment analysis to get sentiment distribution details
+        doc = latest_report_doc() #Fetches latest report from firebase
+        if doc is None:
+            raise PreventUpdate #No report exists yet, no change happen
+
+        artifact = report_artifact(doc) #Precomputed sentiment distribution details, a few kilobytes instead of the whole csv
+        report = artifact['report']
+        result = report['overall']
 
         if tab == "tab-dept":
-            dept_cols = [c for c in df.columns if 'dept' in c.lower() or 'department' in c.lower()]
-            if dept_cols:
-                dept_col = dept_cols[0]
-                depts = sorted(df[dept_col].dropna().unique()) #Fetches all departments from the departments column in the csv, alphabetically sorted
+            if artifact['segment_columns']['departments']:
+                depts = list(report['departments']) #All departments from the departments column in the csv, alphabetically sorted
             else:
                 depts = sorted(result.get('department_sentiment', {}).keys()) #Get's department for which sentiment was analyzed if not department list was found
             options = [{"label": d, "value": d} for d in depts] #Creates dropdown options for department based categories 
@@ -176,10 +285,8 @@ def register_callbacks(app):
                 html.Div(id="dept-content", className="mt-4") #Division to display report for that department 
             ])
         elif tab == "tab-status":
-            status_cols = [c for c in df.columns if 'status' in c.lower()]
-            if status_cols:
-                status_col = status_cols[0]
-                statuses = sorted(df[status_col].dropna().unique()) #Fetches all job statuses from the departments column in the csv, alphabetically sorted
+            if artifact['segment_columns']['statuses']:
+                statuses = list(report['statuses']) #All job statuses from the status column in the csv, alphabetically sorted
                 statuses = [str(s).capitalize() for s in statuses] #Fixes capitalization
             else:
                 statuses = [s.capitalize() for s in result.get('status_sentiment', {}).keys()] #Get's job statuses for which sentiment was analyzed if not department list was found
@@ -191,24 +298,11 @@ def register_callbacks(app):
                 html.Div(id="status-content", className="mt-4") #Division to display report for that department
             ])
         else: #Overall sentiment
-            labels = ['Positive', 'Neutral', 'Negative']
             counts = result.get('overall_sentiment_counts', {}) #gets overall sentiment percentages
             values = [counts.get(lbl, 0) for lbl in labels]
 
             #Generates pie chart for displaying the sentiment distribution
-            fig = px.pie(
-                names=labels,
-                values=values,
-                title=f"Overall Sentiment",
-                color=labels,
-                color_discrete_map={
-                    'Positive': '#63FF70',
-                    'Neutral': '#FFBF00',
-                    'Negative': '#FF2A2A'
-                },
-            ) 
-            fig.update_traces(textinfo='percent+label', textfont=dict(size=16, family="Arial Black"))
-            fig.update_layout(margin=dict(t=50, b=50, l=50, r=50), paper_bgcolor = "#cbe5ff") 
+            fig = sentiment_figure(values, "Overall Sentiment", 16)
 
             pros_summary = result.get('pros_summary', '') #Get's pros summary from the result
             cons_summary = result.get('cons_summary', '') #Get's cons summary from the result
@@ -246,50 +340,18 @@ def register_callbacks(app):
         if not selected_dept:
             raise PreventUpdate #Prevents changes if nothing is selected
 
-        db = firestore.client()
-        bucket = storage.bucket()
-        #Fetches latest report from firebase
-        docs = (
-            db.collection("reports")
-              .order_by("timestamp", direction=firestore.Query.DESCENDING)
-              .limit(1)
-              .stream()
-        )
-        doc = next(docs)
-        meta = doc.to_dict()
-        blob = bucket.blob(meta["storage_path"])
-        tmp = tempfile.NamedTemporaryFile(suffix=".csv", delete=False)
-        blob.download_to_filename(tmp.name)
-        df = pd.read_csv(tmp.name)
-
-        cols = {c.lower(): c for c in df.columns}
-        dept_col = next((cols[k] for k in cols if 'dept' in k or 'department' in k), None) #Find department column from the firestore storage csv associated with the report
-
-        if dept_col:
-            df = df[df[dept_col] == selected_dept] #Assigning only details of selected department records to df
-            if df.empty:
-                raise PreventUpdate
-        else:
-            raise PreventUpdate
+        doc = latest_report_doc() #Fetches latest report from firebase
+        artifact = report_artifact(doc)
+        if not artifact['segment_columns']['departments']:
+            raise PreventUpdate #No department column in the csv associated with the report
 
-        result = analyze_reviews(df, is_csv=False) #Sentiment Analysis
+        result = artifact['report']['departments'].get(str(selected_dept)) #Precomputed sentiment analysis of the selected department
+        if result is None:
+            raise PreventUpdate
         counts = result.get('overall_sentiment_counts', {})
-        labels = ['Positive', 'Neutral', 'Negative']
         values = [counts.get(l, 0) for l in labels] #Get's overall sentiment for that department
 
-        fig = px.pie(
-            names=labels,
-            values=values,
-            title=f"{selected_dept.capitalize()} Employee Sentiment",
-            color=labels,
-            color_discrete_map={
-                'Positive': "#63FF70",
-                'Neutral': '#FFBF00',
-                'Negative': "#FF2A2A"
-            }
-        )
-        fig.update_traces(textinfo='percent+label', textfont=dict(size=16, family="Arial Black"))
-        fig.update_layout(margin=dict(t=50, b=50, l=50, r=50), paper_bgcolor = "#cbe5ff")
+        fig = sentiment_figure(values, f"{selected_dept.capitalize()} Employee Sentiment", 16)
 
         #Saves pros and cons summary and key pros and cons with descriptions
         pros_summary = result.get('pros_summary', '')
@@ -328,48 +390,28 @@ def register_callbacks(app):
         if not selected_status:
             raise PreventUpdate #Prevents changes if nothing is selected
 
-        db = firestore.client()
-        bucket = storage.bucket()
-        #Fetches latest report from firebase
-        docs = (
-            db.collection("reports")
-              .order_by("timestamp", direction=firestore.Query.DESCENDING)
-              .limit(1)
-              .stream()
-        )
-        doc = next(docs)
-        meta = doc.to_dict()
-        blob = bucket.blob(meta["storage_path"])
-        tmp = tempfile.NamedTemporaryFile(suffix=".csv", delete=False)
-        blob.download_to_filename(tmp.name)
-        df = pd.read_csv(tmp.name)
-
-        cols = {c.lower(): c for c in df.columns}
-        status_col = next((cols[k] for k in cols if 'status' in k), None) #Find job status column from the firestore storage csv associated with the report
-        if status_col:
-            df = df[df[status_col].astype(str).str.lower() == selected_status.lower()] #Assigning only details of current job status record to df
-            if df.empty:
-                raise PreventUpdate
-        else:
+        doc = latest_report_doc() #Fetches latest report from firebase
+        artifact = report_artifact(doc)
+        status_col = artifact['segment_columns']['statuses'] #Job status column from the firestore storage csv associated with the report
+        if not status_col:
             raise PreventUpdate
 
-        result = analyze_reviews(df, is_csv=False) #Sentiment Analysis
+        matches = [r for s, r in artifact['report']['statuses'].items() if s.lower() == selected_status.lower()]
+        if not matches:
+            raise PreventUpdate
+        if len(matches) == 1:
+            result = matches[0] #Precomputed sentiment analysis of the selected job status
+        else: #Statuses differing only in capitalization are merged, which the per-status artifact entries cannot provide
+            csv_path = download_report_csv(doc.to_dict())
+            df = read_columns(csv_path)
+            df = df[df[status_col].astype(str).str.lower() == selected_status.lower()] #Assigning only details of current job status record to df
+            result = result_cache.get_or_compute(
+                analysis_key(file_digest(csv_path), ('status', selected_status.lower())),
+                lambda: analyze_reviews(df, is_csv=False)
+            ) #Sentiment Analysis
         counts = result.get('overall_sentiment_counts', {})
-        labels = ['Positive', 'Neutral', 'Negative']
         values = [counts.get(l, 0) for l in labels] #Get's overall sentiment for that job status
-        fig = px.pie(
-            names=labels,
-            values=values,
-            title=f"{selected_status.capitalize()} Employee Sentiment",
-            color=labels,
-            color_discrete_map={
-                'Positive': "#63FF70",
-                'Neutral': '#FFBF00',
-                'Negative': "#FF2A2A"
-            }
-        )
-        fig.update_traces(textinfo='percent+label', textfont=dict(size=26, family="Arial Black"))
-        fig.update_layout(margin=dict(t=50, b=50, l=50, r=50), paper_bgcolor = "#cbe5ff") #Generates pie chart of sentiment distribution
+        fig = sentiment_figure(values, f"{selected_status.capitalize()} Employee Sentiment", 26) #Generates pie chart of sentiment distribution
         
         #Saves pros and cons summary and key pros and cons with descriptions
         pros_summary = result.get('pros_summary', '') 
@@ -406,182 +448,15 @@ def register_callbacks(app):
         allow_duplicate=True
     )
     def download_pdf(n):
-        #Repeats previous steps to get details of the report including pros and cons summary and key pros and cons with descriptions and sentiment distribution
-        db = firestore.client()
-        bucket = storage.bucket()
-        docs = (
-            db.collection("reports")
-              .order_by("timestamp", direction=firestore.Query.DESCENDING)
-              .limit(1)
-              .stream()
-        )
-        doc = next(docs)
-        meta = doc.to_dict()
-        doc_ref = doc.reference
-
-        blob = bucket.blob(meta["storage_path"])
-        tmp = tempfile.NamedTemporaryFile(suffix=".csv", delete=False)
-        blob.download_to_filename(tmp.name)
-        df = pd.read_csv(tmp.name)
-
-        result_general = analyze_reviews(tmp.name)
-        counts = result_general.get('overall_sentiment_counts', {})
-        pros_summary = result_general.get('pros_summary', '')
-        cons_summary = result_general.get('cons_summary', '')
-        key_pros = result_general.get('key_pros', [])
-        key_cons = result_general.get('key_cons', [])
-
-        #Generating pie chart for overall sentiment
-        labels = ['Positive', 'Neutral', 'Negative']
-        values = [counts.get(l, 0) for l in labels] # Fetches values for pie chart
-        colors = ['#63FF70', '#FFBF00', '#FF2A2A']  # hex code for amber inserted
-        plt.figure(figsize=(6,6))
-        plt.pie(values, labels=labels, autopct='%1.1f%%', colors=colors, startangle=90)
-        plt.title("Overall Sentiment") #Piechart title
-        img_general = tempfile.NamedTemporaryFile(suffix=".png", delete=False) #temporary file for generating the pie chart
-        plt.savefig(img_general.name, bbox_inches='tight') #Saves the piechart 
-        plt.close()
-
-        #Prepares default style, title, subtitle, and body styles
-        styles = getSampleStyleSheet()
-        title_style = styles['Heading1']
-        subtitle_style = styles['Heading2']
-        body_style = styles['BodyText']
-
-        story = [] #Starts dictionary where pdf will be generated onto
-        story.append(Paragraph("Sentiment Analysis Report", title_style)) #Adds text sentiment analysis
-        date_str = datetime.date.today().strftime('%B %d, %Y')
-        story.append(Paragraph(f"Generated on {date_str}", subtitle_style)) #Adds date and timestamp
-        story.append(Spacer(1, 12)) #Spacing between elements with format of - horizontal, vertical 
-
-        story.append(Image(img_general.name, width=400, height=400)) #Adds an image that is the pie chart
-        story.append(Spacer(1, 12))
-
-        story.append(Paragraph("Pros", subtitle_style)) #Pros Header
-        story.append(Paragraph(pros_summary, body_style)) #Pros Summary title added
-        #Loops through the list of pros in key_pros and add corresponding descriptions as a bullet point style list to the pdf
-        for p in key_pros:
-            title = p.get('title', '') 
-            desc = p.get('description', '').strip().lower().capitalize()
-            story.append(ListFlowable([Paragraph(f"<b>{title}</b>: {desc}", body_style)], bulletType='bullet', leftIndent=20))
-        story.append(Spacer(1, 6))
-        story.append(Paragraph("Areas for Improvement", subtitle_style)) #Repeats steps for cons
-        story.append(Paragraph(cons_summary, body_style))
-        for c in key_cons:
-            title = c.get('title', '')
-            desc = c.get('description', '').strip().lower().capitalize()
-            story.append(ListFlowable([Paragraph(f"<b>{title}</b>: {desc}", body_style)], bulletType='bullet', leftIndent=20))
-
-        # Repeats steps for adding overall sentiment for department sentiment, below overall sentiment details with same steps as report generation
-        dept_cols = [c for c in df.columns if 'dept' in c.lower() or 'department' in c.lower()] 
-        if dept_cols:
-            dept_col = dept_cols[0]
-            departments = sorted(df[dept_col].dropna().unique())
-            for dept in departments:
-                df_dept = df[df[dept_col] == dept]
-                if df_dept.empty:
-                    continue
-                result_dept = analyze_reviews(df_dept, is_csv=False)
-                counts_d = result_dept.get('overall_sentiment_counts', {})
-                pros_sum_d = result_dept.get('pros_summary', '')
-                cons_sum_d = result_dept.get('cons_summary', '')
-                key_pros_d = result_dept.get('key_pros', [])
-                key_cons_d = result_dept.get('key_cons', [])
-
-                values_d = [counts_d.get(l, 0) for l in labels]
-                plt.figure(figsize=(6,6))
-                plt.pie(values_d, labels=labels, autopct='%1.1f%%', colors=colors, startangle=90)
-                plt.title(f"{dept} Sentiment")
-                img_dept = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
-                plt.savefig(img_dept.name, bbox_inches='tight')
-                plt.close()
-
-                story.append(PageBreak())
-                story.append(Paragraph(f"Department: {dept}", subtitle_style))
-                story.append(Spacer(1, 12))
-                story.append(Image(img_dept.name, width=400, height=400))
-                story.append(Spacer(1, 12))
-
-                story.append(Paragraph("Pros", subtitle_style))
-                story.append(Paragraph(pros_sum_d, body_style))
-                for p in key_pros_d:
-                    title = p.get('title', '')
-                    desc = p.get('description', '').strip().lower().capitalize()
-                    story.append(ListFlowable([Paragraph(f"<b>{title}</b>: {desc}", body_style)], bulletType='bullet', leftIndent=20))
-                story.append(Spacer(1, 6))
-                story.append(Paragraph("Areas for Improvement", subtitle_style))
-                story.append(Paragraph(cons_sum_d, body_style))
-                for c in key_cons_d:
-                    title = c.get('title', '')
-                    desc = c.get('description', '').strip().lower().capitalize()
-                    story.append(ListFlowable([Paragraph(f"<b>{title}</b>: {desc}", body_style)], bulletType='bullet', leftIndent=20))
-
-        # Repeats steps for adding overall sentiment for job status sentiment, below department based sentiment details with same steps as report generation
-        status_cols = [c for c in df.columns if 'status' in c.lower()]
-        if status_cols:
-            status_col = status_cols[0]
-            statuses = sorted(df[status_col].dropna().unique())
-            for status in statuses:
-                df_stat = df[df[status_col] == status]
-                if df_stat.empty:
-                    continue
-                result_stat = analyze_reviews(df_stat, is_csv=False)
-                counts_s = result_stat.get('overall_sentiment_counts', {})
-                pros_sum_s = result_stat.get('pros_summary', '')
-                cons_sum_s = result_stat.get('cons_summary', '')
-                key_pros_s = result_stat.get('key_pros', [])
-                key_cons_s = result_stat.get('key_cons', [])
-
-                values_s = [counts_s.get(l, 0) for l in labels]
-                plt.figure(figsize=(6,6))
-                plt.pie(values_s, labels=labels, autopct='%1.1f%%', colors=colors, startangle=90)
-                plt.title(f"{status} Employee Sentiment")
-                img_stat = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
-                plt.savefig(img_stat.name, bbox_inches='tight')
-                plt.close()
-
-                story.append(PageBreak())
-                story.append(Paragraph(f"Status: {status}", subtitle_style))
-                story.append(Spacer(1, 12))
-                story.append(Image(img_stat.name, width=400, height=400))
-                story.append(Spacer(1, 12))
-
-                story.append(Paragraph("Pros", subtitle_style))
-                story.append(Paragraph(pros_sum_s, body_style))
-                for p in key_pros_s:
-                    title = p.get('title', '')
-                    desc = p.get('description', '').strip().lower().capitalize()
-                    story.append(ListFlowable([Paragraph(f"<b>{title}</b>: {desc}", body_style)], bulletType='bullet', leftIndent=20))
-                story.append(Spacer(1, 6))
-                story.append(Paragraph("Areas for Improvement", subtitle_style))
-                story.append(Paragraph(cons_sum_s, body_style))
-                for c in key_cons_s:
-                    title = c.get('title', '')
-                    desc = c.get('description', '').strip().lower().capitalize()
-                    story.append(ListFlowable([Paragraph(f"<b>{title}</b>: {desc}", body_style)], bulletType='bullet', leftIndent=20))
+        doc = latest_report_doc()
+        if doc is None:
+            raise PreventUpdate
+        pdf_path, generation = report_pdf(doc.reference).result() #Already built in the background - otherwise waits for the one build in progress
+        pdf_bytes = blob_cache.get_bytes(storage_bucket().blob(pdf_path), generation) #Streams the stored pdf, reusing the local copy when it is cached
+        base_name = doc.to_dict()["storage_path"].split("/")[-1].rsplit(".", 1)[0] #Basename of the csv
+        return dcc.send_bytes(pdf_bytes, filename=f"{base_name}.pdf") #returns the bytes version of the pdf to dash to download via the browser
 
-        
-        
-        buffer = BytesIO() #Creates a buffer variable to temporarily store the pdf for building with Bytes datatype to store the file
-        #Variable is a bytes variable for easily passing onto browser for enabling download
-        doc_pdf = SimpleDocTemplate(buffer, pagesize=letter) #Uses reportlabs to create a pdf document template and store in doc_pdf with bytes version in buffer
-        doc_pdf.build(story) #Build the story dictionary into doc_pdf to buld the pdf
-        pdf_bytes = buffer.getvalue() #Stores the details of the pdf in byte form from buffer into pdf_bytes
-
-        csv_name = meta["storage_path"].split("/")[-1] #Finds csv name from filepath in firestore storage
-        base_name = csv_name.rsplit(".", 1)[0] #Finds basename of the csv
-        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S") #Generates timestamp
-        pdf_name = f"{base_name}_{timestamp}.pdf" #Stores pdf name by combining base name and timestamp
-        pdf_path = f"reports/{pdf_name}" #Defines filepath of the pdf in the reports collection in firebase
-
-        blob_pdf = bucket.blob(pdf_path) #Stores details of the firestore storage handle where te file should be sotres
-        blob_pdf.upload_from_string(pdf_bytes, content_type='application/pdf') #Uploads the bytes information of the pdf to that firestore storage handle
-        #The content type also defined for the browser to know it is a df 
-        doc_ref.update({"pdf_path": pdf_path}) #Updates the file path with the firestorage storage handle
-
-        return dcc.send_bytes(pdf_bytes, filename=pdf_name) #returns the bytes version of the pdf to dash to download via the browser
-
-    #Repeats pdf generation steps for upload to firestore storage immediately when the report page is loaded
+    #Makes sure the pdf of the report is in firestore storage when the report page is loaded
     @app.callback(
         [
             Output("upload-toast", "is_open"), #Checks if the upload bar is hidden or visible
@@ -592,175 +467,8 @@ def register_callbacks(app):
     def upload_pdf_on_load(n):
         if not n:
             raise PreventUpdate
-
-        db = firestore.client()
-        bucket = storage.bucket()
-        docs = (
-            db.collection("reports")
-              .order_by("timestamp", direction=firestore.Query.DESCENDING)
-              .limit(1)
-              .stream()
-        )
-        doc = next(docs)
-        meta = doc.to_dict()
-        doc_ref = doc.reference
-
-        # download the latest CSV
-        blob = bucket.blob(meta["storage_path"])
-        tmp = tempfile.NamedTemporaryFile(suffix=".csv", delete=False)
-        blob.download_to_filename(tmp.name)
-        df = pd.read_csv(tmp.name)
-
-        # analyze overall
-        result_general = analyze_reviews(tmp.name)
-        counts = result_general.get('overall_sentiment_counts', {})
-        pros_summary = result_general.get('pros_summary', '')
-        cons_summary = result_general.get('cons_summary', '')
-        key_pros = result_general.get('key_pros', [])
-        key_cons = result_general.get('key_cons', [])
-
-        # generate pie chart image for general
-        labels = ['Positive', 'Neutral', 'Negative']
-        values = [counts.get(l, 0) for l in labels]
-        colors = ['#63FF70', '#FFBF00', '#FF2A2A']  # Colors for the pie chart - hex code for amber
-        plt.figure(figsize=(6,6))
-        plt.pie(values, labels=labels, autopct='%1.1f%%', colors=colors, startangle=90)
-        plt.title("Overall Sentiment")
-        img_general = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
-        plt.savefig(img_general.name, bbox_inches='tight')
-        plt.close()
-
-        # prepare PDF content
-        styles = getSampleStyleSheet()
-        title_style = styles['Heading1']
-        subtitle_style = styles['Heading2']
-        body_style = styles['BodyText']
-
-        story = []
-        story.append(Paragraph("Sentiment Analysis Report", title_style))
-        date_str = datetime.date.today().strftime('%B %d, %Y')
-        story.append(Paragraph(f"Generated on {date_str}", subtitle_style))
-        story.append(Spacer(1, 12))
-
-        story.append(Image(img_general.name, width=400, height=400))
-        story.append(Spacer(1, 12))
-
-        story.append(Paragraph("Pros", subtitle_style))
-        story.append(Paragraph(pros_summary, body_style))
-        for p in key_pros:
-            title = p.get('title', '')
-            desc = p.get('description', '').strip().lower().capitalize()
-            story.append(ListFlowable([Paragraph(f"<b>{title}</b>: {desc}", body_style)], bulletType='bullet', leftIndent=20))
-        story.append(Spacer(1, 6))
-        story.append(Paragraph("Areas for Improvement", subtitle_style))
-        story.append(Paragraph(cons_summary, body_style))
-        for c in key_cons:
-            title = c.get('title', '')
-            desc = c.get('description', '').strip().lower().capitalize()
-            story.append(ListFlowable([Paragraph(f"<b>{title}</b>: {desc}", body_style)], bulletType='bullet', leftIndent=20))
-
-        # Department analysis
-        dept_cols = [c for c in df.columns if 'dept' in c.lower() or 'department' in c.lower()]
-        if dept_cols:
-            dept_col = dept_cols[0]
-            departments = sorted(df[dept_col].dropna().unique())
-            for dept in departments:
-                df_dept = df[df[dept_col] == dept]
-                if df_dept.empty:
-                    continue
-                result_dept = analyze_reviews(df_dept, is_csv=False)
-                counts_d = result_dept.get('overall_sentiment_counts', {})
-                pros_sum_d = result_dept.get('pros_summary', '')
-                cons_sum_d = result_dept.get('cons_summary', '')
-                key_pros_d = result_dept.get('key_pros', [])
-                key_cons_d = result_dept.get('key_cons', [])
-
-                values_d = [counts_d.get(l, 0) for l in labels]
-                plt.figure(figsize=(6,6))
-                plt.pie(values_d, labels=labels, autopct='%1.1f%%', colors=colors, startangle=90)
-                plt.title(f"{dept} Sentiment")
-                img_dept = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
-                plt.savefig(img_dept.name, bbox_inches='tight')
-                plt.close()
-
-                story.append(PageBreak())
-                story.append(Paragraph(f"Department: {dept}", subtitle_style))
-                story.append(Spacer(1, 12))
-                story.append(Image(img_dept.name, width=400, height=400))
-                story.append(Spacer(1, 12))
-
-                story.append(Paragraph("Pros", subtitle_style))
-                story.append(Paragraph(pros_sum_d, body_style))
-                for p in key_pros_d:
-                    title = p.get('title', '')
-                    desc = p.get('description', '').strip().lower().capitalize()
-                    story.append(ListFlowable([Paragraph(f"<b>{title}</b>: {desc}", body_style)], bulletType='bullet', leftIndent=20))
-                story.append(Spacer(1, 6))
-                story.append(Paragraph("Areas for Improvement", subtitle_style))
-                story.append(Paragraph(cons_sum_d, body_style))
-                for c in key_cons_d:
-                    title = c.get('title', '')
-                    desc = c.get('description', '').strip().lower().capitalize()
-                    story.append(ListFlowable([Paragraph(f"<b>{title}</b>: {desc}", body_style)], bulletType='bullet', leftIndent=20))
-
-        # Employment status analysis
-        status_cols = [c for c in df.columns if 'status' in c.lower()]
-        if status_cols:
-            status_col = status_cols[0]
-            statuses = sorted(df[status_col].dropna().unique())
-            for status in statuses:
-                df_stat = df[df[status_col] == status]
-                if df_stat.empty:
-                    continue
-                result_stat = analyze_reviews(df_stat, is_csv=False)
-                counts_s = result_stat.get('overall_sentiment_counts', {})
-                pros_sum_s = result_stat.get('pros_summary', '')
-                cons_sum_s = result_stat.get('cons_summary', '')
-                key_pros_s = result_stat.get('key_pros', [])
-                key_cons_s = result_stat.get('key_cons', [])
-
-                values_s = [counts_s.get(l, 0) for l in labels]
-                plt.figure(figsize=(6,6))
-                plt.pie(values_s, labels=labels, autopct='%1.1f%%', colors=colors, startangle=90)
-                plt.title(f"{status} Employee Sentiment")
-                img_stat = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
-                plt.savefig(img_stat.name, bbox_inches='tight')
-                plt.close()
-
-                story.append(PageBreak())
-                story.append(Paragraph(f"Status: {status}", subtitle_style))
-                story.append(Spacer(1, 12))
-                story.append(Image(img_stat.name, width=400, height=400))
-                story.append(Spacer(1, 12))
-
-                story.append(Paragraph("Pros", subtitle_style))
-                story.append(Paragraph(pros_sum_s, body_style))
-                for p in key_pros_s:
-                    title = p.get('title', '')
-                    desc = p.get('description', '').strip().lower().capitalize()
-                    story.append(ListFlowable([Paragraph(f"<b>{title}</b>: {desc}", body_style)], bulletType='bullet', leftIndent=20))
-                story.append(Spacer(1, 6))
-                story.append(Paragraph("Areas for Improvement", subtitle_style))
-                story.append(Paragraph(cons_sum_s, body_style))
-                for c in key_cons_s:
-                    title = c.get('title', '')
-                    desc = c.get('description', '').strip().lower().capitalize()
-                    story.append(ListFlowable([Paragraph(f"<b>{title}</b>: {desc}", body_style)], bulletType='bullet', leftIndent=20))
-
-        # build PDF
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        doc.build(story)
-        pdf_bytes = buffer.getvalue()
-
-        csv_name = meta["storage_path"].split("/")[-1]
-        base_name = csv_name.rsplit(".", 1)[0]
-        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-        pdf_name = f"{base_name}_{timestamp}.pdf"
-        pdf_path = f"reports/{pdf_name}"
-
-        blob_pdf = bucket.blob(pdf_path)
-        blob_pdf.upload_from_string(pdf_bytes, content_type='application/pdf')
-        doc_ref.update({"pdf_path": pdf_path})
-
+        doc = latest_report_doc()
+        if doc is None:
+            raise PreventUpdate
+        report_pdf(doc.reference).result() #Returns at once when this content was built before
         return True, {"display": "none"}  # Displays the page
@@ -1,20 +1,25 @@
 # importing libraries
 import os
-import base64
 from datetime import datetime
 from urllib.parse import quote as urlquote
 import dash
-from dash import dcc, html, Input, Output, State, callback, no_update
+from dash import dcc, html, Input, Output, State, Patch, callback, no_update
 from dash.exceptions import PreventUpdate
 from dash.dependencies import ALL
 import dash_bootstrap_components as dbc
-from firebase_admin import firestore, storage
+from firebase_client import firestore_client, storage_bucket
 import pandas as pd 
+from report_artifact import artifact_path, build_artifact, save_artifact
+from blob_cache import blob_cache
+from report_meta import latest_report
+from report_listing import report_page
+from generate_report import report_pdf
+from csv_upload import upload_path
+from columnar_store import to_columnar, csv_columns, read_columns
+from jobs import job_queue
 
-# Declares directories used
-UPLOAD_DIR = "uploads"
+# Declares directories used - csvs are streamed to csv_upload.UPLOAD_DIR by the /upload route
 REPORTS_DIR = "reports"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(REPORTS_DIR, exist_ok=True)
 
 #Variables to store CSS-based style attribute dictionaries 
@@ -69,28 +74,120 @@ def home_layout():
         ]
     )
 
+#Function for displaying one past report as a card
+def report_card(entry):
+    #Storing date and time stamps, file name, and path of the entry
+    date_str = entry['ts'].strftime("%Y-%m-%d %H:%M:%S") 
+    filename = f"AngaraiThriveReport_{entry['ts'].strftime('%Y-%m-%d')}"  #Set's File Name
+    pdf_path = entry['pdf_path']
+    icon_id = f"dl-icon-{entry['id']}" #Icon id based on the firestore document id, unique across pages
+    #f tells python it is a formatted string literal
+
+    btn_id = {'type': 'download-btn', 'index': entry['id'], 'pdf_path': pdf_path, 'name': f"{filename}.pdf"} 
+    #Encapsulated the functioning of the download button to btn-id allowing reusability of the button
+
+    return html.Div( #Generates the card for the report
+        className="border rounded p-3 mb-3 bg-white shadow-sm",
+        children=[
+            html.Div(
+                className="d-flex justify-content-between align-items-center",
+                children=[
+                    html.Div([
+                        html.Div(filename, className="fw-bold"),
+                        html.Div(date_str, className="text-muted small")
+                    ]),
+                    dbc.Button(
+                        [html.I(className="bi bi-download me-1", id=icon_id), "Download PDF"],
+                        id=btn_id,
+                        color="primary",
+                        outline=True,
+                        size="sm",
+                        n_clicks=0,
+                        disabled=(pdf_path == "")
+                    ) #Downloads Report button
+                ]
+            ),
+            dbc.Tooltip("Download report PDF", target=icon_id) #Hovering over download icon reveals message : "Download report PDF"
+        ]
+    )
+
+#Stages of report generation, in order, with the label shown while each one runs
+GENERATION_STAGES = ["upload", "analyze", "record"]
+STAGE_LABELS = {"upload": "Uploading CSV...", "analyze": "Analyzing reviews...", "record": "Saving report..."}
+
+#Latest review date in the csv, falls back to the current date and time - only the date column is read
+def latest_review_time(csv_path):
+    columns = csv_columns(csv_path)
+    date_cols = [c for c in columns if any(x in c.lower() for x in ['date', 'time', 'timestamp'])] #Checks for a date time column
+    if not date_cols:
+        return datetime.now()  #for all exceptions, takes current date and time at time of upload
+    date_col = None  
+    for key in ['timestamp', 'date', 'time']:  #Looks for key words among the columns
+        for col in date_cols:  
+            if key in col.lower(): 
+                date_col = col  
+                break  
+        if date_col:  
+            break 
+    series = pd.to_datetime(read_columns(csv_path, [date_col])[date_col], errors='coerce')  #Converts column data to datetime format
+    series = series.dropna()  #removes NaN values
+    if series.empty:
+        return datetime.now()
+    last_ts_dt = series.max()  #Finds latest value - maximum value 
+    if pd.isna(last_ts_dt) or (hasattr(last_ts_dt, 'year') and last_ts_dt.year < 2000): 
+        return datetime.now()  #If date and time does not exist or is out of bounds, takes date and time of upload
+    return last_ts_dt
+
+#Runs on the job queue - uploads the csv, precomputes the report and stores it in firebase, returns the report document id
+def generate_report_job(job, csv_path, filename):
+    job.advance("upload")
+    to_columnar(csv_path) #Parses the csv once, every later read of this upload is served from the columnar copy
+    db = firestore_client()
+    bucket = storage_bucket() #Firestore Storage Bucket for storing the csvs and pdfs of reports
+    last_ts_dt = latest_review_time(csv_path)
+    ts_str = last_ts_dt.strftime("%Y-%m-%d_%H-%M-%S") #Setting timestamp of the report
+
+    #Uploading csv to firestore stroage bucket
+    csv_blob = bucket.blob(f"reports/{ts_str}_{filename}")
+    csv_blob.upload_from_filename(csv_path, content_type='text/csv') #Uploads the csv to the reports storage location in the Firestore Storage Bucket
+
+    #Precomputes counts, segment tallies, keywords and gemini text so report pages and pdfs never re-read the csv
+    job.advance("analyze")
+    summary_path = artifact_path(f"reports/{ts_str}_{filename}")
+    summary_generation = save_artifact(bucket, summary_path, build_artifact(csv_path))
+
+    # Stores data of the report including timestamp to the reports database in firebase
+    job.advance("record")
+    _, doc_ref = db.collection("reports").add({
+        "timestamp":    pd.Timestamp(last_ts_dt).to_pydatetime(), #Stored natively so firestore can order and page reports by date
+        "filename":     filename,
+        "storage_path": f"reports/{ts_str}_{filename}",
+        "storage_generation": csv_blob.generation, #Lets the local blob cache skip a metadata lookup
+        "pdf_path":     "", #Recorded once the pdf is built in the background
+        "summary_path": summary_path,
+        "summary_generation": summary_generation
+    })
+    latest_report.invalidate() #Report page opens on this new report without waiting for the listener
+    report_pdf(doc_ref) #Starts building the pdf while the browser moves to the report page
+    return doc_ref.id
+
 def register_callbacks(app):
     @app.callback(
-        Output('upload-data', 'children'),
-        Input('upload-data', 'filename'),
-        Input('upload-data', 'contents'),
-        prevent_initial_call=True,
-        allow_duplicate=True #allows mutliple callbacks to same output location
+        Output('upload-prompt', 'children'),
+        Input('upload-handle', 'data'),
+        prevent_initial_call=True
     )
     #Function to control the upload csv area of the tab
-    def update_upload_area(filename, contents): 
-        if not filename or not contents:
+    def update_upload_area(handle): 
+        if not handle or not handle.get('upload_id'):
             return html.Div(['Drag and Drop or ', html.A('Select a CSV File')]) #When no file is uploaded, prompt user to upload csv
-
-        data = contents.split(',')[1] #Processes csv by separating its contents based on commas
-        with open(os.path.join(UPLOAD_DIR, filename), 'wb') as fp: #Opens file system on user's device, allowing uploading of csv
-            fp.write(base64.b64decode(data)) #Converts file to binary and writes to the uploads directory
-
+        #The file itself was streamed to the /upload route by assets/stream_upload.js - dash only gets its handle
         return html.Div(
             style={'textAlign': 'center'},
             children=[
                 html.I("✔", className="text-success", style={"fontSize": "2rem"}),
                 html.Br(),
+                html.Div(f"{handle['filename']} - {handle['rows']:,} reviews", className="fw-bold mt-2"),
                 html.Div("Click here to upload a different CSV", className="text-muted mt-2")
             ]
         ) #Successful CSV Upload Display
@@ -110,9 +207,11 @@ def register_callbacks(app):
                         html.Img(src='assets/AngaraiLogo.jpeg', style={"height": "48px", "marginRight": "10px", "verticalAlign": "middle"}, alt="Logo"),
                         "Thrive"
                     ], className="mb-4"),
-                    dcc.Upload(
+                    html.Div( #Drop area - assets/stream_upload.js opens the file picker on click and streams the chosen file to the server
                         id='upload-data',
-                        children=html.Div(['Drag and Drop or ', html.A('Select CSV File')]),
+                        children=[
+                            html.Div(['Drag and Drop or ', html.A('Select CSV File')], id='upload-prompt')
+                        ],
                         style={
                             'width': '100%',
                             'maxWidth': '600px',
@@ -125,19 +224,21 @@ def register_callbacks(app):
                             'backgroundColor': '#ffffff',
                             'display': 'flex',
                             'alignItems': 'center',
-                            'justifyContent': 'center'
-                        },
-                        multiple=False,
-                        accept='.csv'
-                        
+                            'justifyContent': 'center',
+                            'cursor': 'pointer'
+                        }
                     ),
+                    dcc.Store(id='upload-handle'), #Handle of the streamed upload - id, filename, row count and size
                     dbc.Button(
                         "Generate Report",
                         id="generate-btn",
                         color="primary",
                         className="mt-4 btn-lg shadow",
                         disabled=True
-                    ) #Generate Report button
+                    ), #Generate Report button
+                    dbc.Progress(id='generation-progress', value=0, striped=True, animated=True, style={'display': 'none'}), #Shown while the report is generated
+                    dcc.Store(id='generation-job'), #Id of the queued generation job
+                    dcc.Interval(id='generation-poll', interval=500, disabled=True) #Polls the job's progress
                 ]
             )#Displays the generate report button along with upload csv button with style elements
 
@@ -159,152 +260,104 @@ def register_callbacks(app):
                     )
                 ]
             )
-            # Fetch Firestore Documents from Firestore database(for file references) and storage(for actual files)
-            db = firestore.client() #Creates variable db that acts as the client using firestore
-            docs = db.collection("reports").stream() #Creates variable docs to dtore the entreis in the firebase reports collection
-            report_entries = [] 
-            for doc in docs:
-                data = doc.to_dict() #Converts each file in firebase to a dictionary
-                ts = data.get("timestamp") #stores timestamp of file
-                #Normalizing ts into python datetime object ts_dt
-                if isinstance(ts, str): #if the datetime is a string
-                    ts_dt = datetime.strptime(ts, "%Y-%m-%d_%H-%M-%S") #Converts timestamp to YYYY-MM-DD
-                else: 
-                    ts_dt = ts.to_datetime() if hasattr(ts, 'to_datetime') else ts #checks if ts has a method 'to_datetime' and uses it - As in the case of pandas datestamps 
-                report_entries.append({
-                    'ts': ts_dt,
-                    'filename': data.get("filename"),
-                    'pdf_path': data.get("pdf_path") or "" #If path not available, it is blank
-                }) #Adds file info encapsulated as one entry into the report_entries dictionary
-
-            #Sorting entries by date 
-            report_entries.sort(key=lambda x: x['ts'], reverse=True) #Sorting, lamda tells python to use 'ts' as the value to compare when sorting
-            #Default sorting is ascending - reverse allows to swap it to descending, which provides latest report first as default
-            
-            cards = [] #Creating cards for all the reports
-            for i, entry in enumerate(report_entries): #enumerate allows iteration through the report_entries dictionary
-                #Storing date and time stamps, file name, and path of each entry in report_entries
-                date_str = entry['ts'].strftime("%Y-%m-%d %H:%M:%S") 
-                filename = f"AngaraiThriveReport_{entry['ts'].strftime('%Y-%m-%d')}"  #Set's File Name
-                pdf_path = entry['pdf_path']
-                icon_id = f"dl-icon-{i}" #Icon id based on position in report_entires - loop variable i gives position
-                #f tells python it is a formatted string literal
-
-                btn_id = {'type': 'download-btn', 'index': i, 'pdf_path': pdf_path} 
-                #Encapsulated the functioning of the download button to btn-id allowing reusability of the button
-
-                cards.append(
-                    html.Div( #Generates the cards for all reports
-                        className="border rounded p-3 mb-3 bg-white shadow-sm",
-                        children=[
-                            html.Div(
-                                className="d-flex justify-content-between align-items-center",
-                                children=[
-                                    html.Div([
-                                        html.Div(filename, className="fw-bold"),
-                                        html.Div(date_str, className="text-muted small")
-                                    ]),
-                                    dbc.Button(
-                                        [html.I(className="bi bi-download me-1", id=icon_id), "Download PDF"],
-                                        id=btn_id,
-                                        color="primary",
-                                        outline=True,
-                                        size="sm",
-                                        n_clicks=0,
-                                        disabled=(pdf_path == "")
-                                    ) #Downloads Report button
-                                ]
-                            ),
-                            dbc.Tooltip("Download report PDF", target=icon_id) #Hovering over download icon reveals message : "Download report PDF"
-                        ]
-                    )
-                )
-
-            if not cards:
+            #Only the first page of reports is fetched - ordering and paging happen in firestore
+            entries, cursor = report_page('desc')
+            if not entries:
                 container_children = html.Div("No reports yet.", className="text-center text-muted") #When no reports have been generated yet
             else:
-                container_children = cards #Assigning cards variable to contianer_children
+                container_children = [report_card(entry) for entry in entries]
 
             cards_container = html.Div(container_children, id='reports-list-container') #Setting the main division of the past-reports tab to container_children
+            load_more = dbc.Button(
+                "Load more",
+                id='load-more-reports',
+                color="secondary",
+                outline=True,
+                className="d-block mx-auto",
+                n_clicks=0,
+                style={} if cursor else {'display': 'none'} #Hidden when every report is already shown
+            )
+            cursor_store = dcc.Store(id='reports-cursor', data=cursor) #Position of the next page
             download_component = dcc.Download(id="download-pdf-past") #Used for downloading the pdf onto user system
 
-            return html.Div([sort_dropdown, cards_container, download_component]) #returns page elements of past_reports
+            return html.Div([sort_dropdown, cards_container, load_more, cursor_store, download_component]) #returns page elements of past_reports
 
         else:
             return html.Div() #returns empty page for exception circumstances
 
+    @app.callback(
+        [Output('reports-list-container', 'children'), Output('reports-cursor', 'data'), Output('load-more-reports', 'style')],
+        Input('sort-order-dropdown', 'value'),
+        Input('load-more-reports', 'n_clicks'),
+        State('reports-cursor', 'data'),
+        prevent_initial_call=True
+    )
+    #Re-queries firestore when the sort order changes and appends the next page on load more
+    def update_reports_list(order, n_clicks, cursor):
+        if dash.callback_context.triggered_id == 'load-more-reports':
+            if not cursor:
+                raise PreventUpdate
+            entries, cursor = report_page(order, cursor)
+            cards = Patch() #Appends to the cards already in the browser instead of sending them again
+            cards.extend([report_card(entry) for entry in entries])
+        else:
+            entries, cursor = report_page(order) #New order starts again from the first page
+            cards = [report_card(entry) for entry in entries] or html.Div("No reports yet.", className="text-center text-muted")
+        return cards, cursor, {} if cursor else {'display': 'none'}
+
     @app.callback(
         Output('generate-btn', 'disabled'),
-        Input('upload-data', 'contents'),
+        Input('upload-handle', 'data'),
         allow_duplicate=True
     )
     #Generates content on Generate Report tab only after the csv is uplaoded
-    def toggle_generate(contents):
-        return contents is None
+    def toggle_generate(handle):
+        return not (handle and handle.get('upload_id'))
 
     @app.callback(
-        [Output('home-tabs', 'value'), Output('url', 'pathname')],
+        [Output('generation-job', 'data'), Output('generation-poll', 'disabled')],
         Input('generate-btn', 'n_clicks'),
-        State('upload-data', 'filename'),
-        prevent_initial_call=True,
-        allow_duplicate=True
+        State('upload-handle', 'data'),
+        prevent_initial_call=True
     )
-    #Generates pdf, saves to firebase, and redirects to report page
-    def generate_and_switch(n_clicks, filename):
-        if not n_clicks or not filename:
+    #Queues report generation and starts polling its progress instead of generating inside the request
+    def generate_and_switch(n_clicks, handle):
+        if not n_clicks or not handle or not handle.get('upload_id'):
             raise PreventUpdate #No change if generate_report isn't clicked
+        csv_path = upload_path(handle['upload_id'])  #Path of the uploaded csv, named by its sha256
+        filename = handle['filename']
+        job = job_queue.submit((handle['upload_id'], filename), GENERATION_STAGES, generate_report_job, csv_path, filename)
+        return job.id, False
 
-        db = firestore.client()
-        bucket = storage.bucket() #Firestore Storage Bucket for storing the pdfs of reports
-        csv_path = os.path.join(UPLOAD_DIR, filename)  #Declaring path to save csv 
-        with open(csv_path, 'rb') as f: #Opens pdf in binary read mode as dynamic variable f
-            csv_bytes = f.read() #Stores data in f, the csv, in csv_bytes
-        
-        df = pd.read_csv(csv_path)  # USes pandas to read csv
-        date_cols = [c for c in df.columns if any(x in c.lower() for x in ['date', 'time', 'timestamp'])] #Checks for a date time column
-        if date_cols:  # if any date and time column exists
-            date_col = None  
-            for key in ['timestamp', 'date', 'time']:  #Looks for key words among the columns
-                for col in date_cols:  
-                    if key in col.lower(): 
-                        date_col = col  
-                        break  
-                if date_col:  
-                    break 
-            series = pd.to_datetime(df[date_col], errors='coerce', infer_datetime_format=True)  #Converts column data to datetime format
-            series = series.dropna()  #removes NaN values
-            if not series.empty:  #If column isn't empty
-                last_ts_dt = series.max()  #Finds latest value - maximum value 
-                if pd.isna(last_ts_dt) or (hasattr(last_ts_dt, 'year') and last_ts_dt.year < 2000): 
-                    last_ts_dt = datetime.now()  #If date and time does not exist or is out of bounds, takes date and time of upload
-            else:  
-                last_ts_dt = datetime.now()
-        else: 
-            last_ts_dt = datetime.now()  #for all exceptions, takes current date and time at time of upload
-        ts_str = last_ts_dt.strftime("%Y-%m-%d_%H-%M-%S") #Setting timestamp of pdf
-
-        #Uploading csv to firestore stroage bucket
-        bucket.blob(f"reports/{ts_str}_{filename}")\
-              .upload_from_string(csv_bytes, content_type='text/csv') #Uploads the csv to the reports storage location in the Firestore Storage Bucket
-
-        #Uploading PDF to firesotre storage bucket 
-        pdf_name  = f"AngaraiThriveReport_{last_ts_dt.strftime('%Y-%m-%d')}.pdf"  #Set's pdf name
-        pdf_bytes = b"%PDF-1.4\n%placeholder\n"
-        bucket.blob(f"reports/{ts_str}_{pdf_name}")\
-              .upload_from_string(pdf_bytes, content_type='application/pdf')
-
-        # Stores data of the pdf including timestamp to the reports database in firebase
-        db.collection("reports").add({
-            "timestamp":    ts_str,
-            "filename":     filename,
-            "storage_path": f"reports/{ts_str}_{filename}",
-            "pdf_path":     f"reports/{ts_str}_{pdf_name}"
-        })
-        return 'tab-past', '/report' #Redirects to reports
+    @app.callback(
+        [
+            Output('generation-progress', 'value'),
+            Output('generation-progress', 'label'),
+            Output('generation-progress', 'style'),
+            Output('generation-poll', 'disabled', allow_duplicate=True),
+            Output('home-tabs', 'value'),
+            Output('url', 'pathname')
+        ],
+        Input('generation-poll', 'n_intervals'),
+        State('generation-job', 'data'),
+        prevent_initial_call=True
+    )
+    #Shows the progress of the queued report generation and redirects to the report page when it is done
+    def poll_generation(n, job_id):
+        status = job_queue.status(job_id) if job_id else None
+        shown = {'maxWidth': '600px', 'margin': '1rem auto 0 auto'}
+        if status is None: #Jobs live in one process - lost on a restart or unknown to the worker that got this poll
+            return 100, "Job not found, please generate again", shown, True, no_update, no_update
+        if status['state'] == 'failed':
+            return 100, f"Failed: {status['error']}", shown, True, no_update, no_update
+        if status['state'] == 'done':
+            return 100, "Done", shown, True, 'tab-past', '/report' #Redirects to reports
+        label = STAGE_LABELS.get(status['stage'], "Queued...")
+        return status['progress'] * 100, label, shown, False, no_update, no_update
 
     @app.callback(
         Output('download-pdf-past', 'data'),
-        Input({'type': 'download-btn', 'index': ALL, 'pdf_path': ALL}, 'n_clicks'),
+        Input({'type': 'download-btn', 'index': ALL, 'pdf_path': ALL, 'name': ALL}, 'n_clicks'),
         prevent_initial_call=True,
         allow_duplicate=True
     )
@@ -322,8 +375,8 @@ def register_callbacks(app):
             raise PreventUpdate #If no pdf exists at filepath, no changes
 
         #Fetch the PDF File from Firebase Storage
-        blob = storage.bucket().blob(pdf_path) #Fetches the Storage Bucket Blob of the pdf based on the pdf_path
-        pdf_bytes = blob.download_as_bytes() #Converts the blob to bytes
-        filename = os.path.basename(pdf_path) #Extracts only final filename from the entire path
+        blob = storage_bucket().blob(pdf_path) #Fetches the Storage Bucket Blob of the pdf based on the pdf_path
+        pdf_bytes = blob_cache.get_bytes(blob) #Converts the blob to bytes, reusing the local copy when the pdf is unchanged
+        filename = trigger_id.get('name') or os.path.basename(pdf_path) #Stored pdfs are named by content hash, so the card's report name is used
 
         return dcc.send_bytes(pdf_bytes, filename=filename) #Send the bytes of the pdf to dash for download from browser to user device
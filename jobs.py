@@ -0,0 +1,111 @@
+#Importing Libraries
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import jsonify
+
+JOB_WORKERS = int(os.environ.get("THRIVE_JOB_WORKERS", "2")) #Report generations running at the same time
+JOB_RETAIN = int(os.environ.get("THRIVE_JOB_RETAIN", "200")) #Finished jobs kept so their status and result can still be read
+
+
+class Job:
+    #One queued unit of work made of named stages - progress is updated by the worker and read by status polls
+    def __init__(self, key, stages):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.stages = list(stages)
+        self.state = "queued" #queued, running, done or failed
+        self.stage = None
+        self.progress = 0.0 #0 to 1 across all stages
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def advance(self, stage: str, fraction: float = 0.0):
+        #Called by the job function as it moves through its stages - fraction is the share of this stage already done
+        with self._lock:
+            index = self.stages.index(stage)
+            self.stage = stage
+            self.progress = (index + min(max(fraction, 0.0), 1.0)) / len(self.stages)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "id": self.id,
+                "state": self.state,
+                "stage": self.stage,
+                "stages": self.stages,
+                "progress": round(self.progress, 3),
+                "result": self.result if self.state == "done" else None,
+                "error": self.error
+            }
+
+
+class JobQueue:
+    #Local job queue with a worker pool - requests submit work and poll for status instead of waiting on it
+    #Jobs are keyed by their input, so submitting the same input again returns the running or finished job rather than redoing the work
+    def __init__(self, workers: int = JOB_WORKERS, retain: int = JOB_RETAIN):
+        self.retain = retain
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._jobs = OrderedDict() #job id -> Job, oldest first
+        self._by_key = {} #key -> job id of the latest job that has not failed
+        self._lock = threading.Lock()
+
+    def submit(self, key, stages, fn, *args) -> Job:
+        #fn(job, *args) runs on a worker, reports progress through job.advance and returns the job's result
+        with self._lock:
+            job = self._jobs.get(self._by_key.get(key))
+            if job is not None and job.state != "failed":
+                return job #Already queued, running or done - retries are free
+            job = Job(key, stages)
+            self._jobs[job.id] = job
+            self._by_key[key] = job.id
+            self._trim()
+        self._pool.submit(self._run, job, fn, args)
+        return job
+
+    def _run(self, job, fn, args):
+        with job._lock:
+            job.state = "running"
+        try:
+            result = fn(job, *args)
+        except Exception as e:
+            with job._lock:
+                job.state, job.error, job.finished = "failed", str(e), time.time()
+            return
+        with job._lock:
+            job.state, job.result, job.progress, job.finished = "done", result, 1.0, time.time()
+
+    def _trim(self):
+        #Forgets the oldest finished jobs once more than retain are kept
+        finished = [j for j in self._jobs.values() if j.finished is not None]
+        for job in finished[:max(0, len(finished) - self.retain)]:
+            del self._jobs[job.id]
+            if self._by_key.get(job.key) == job.id:
+                del self._by_key[job.key]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self, job_id):
+        job = self.get(job_id)
+        return job.status() if job is not None else None
+
+
+job_queue = JobQueue() #Shared by every callback in this process
+
+
+def register_routes(server):
+    #Job status endpoint on the dash flask server, e.g. GET /jobs/<id>
+    def job_status(job_id):
+        status = job_queue.status(job_id)
+        if status is None:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(status)
+    server.add_url_rule("/jobs/<job_id>", "job_status", job_status)
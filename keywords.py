@@ -0,0 +1,39 @@
+#Importing Libraries
+import heapq
+import string
+from collections import Counter
+from itertools import islice
+from operator import itemgetter
+
+BLOCK_ROWS = 2048 #Rows tokenized together, keeps the temporary string small
+PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation) #Compiled once, removes punctuation from a row in one pass
+
+#Conjunctions, transitions, pronouns and other common words not related to the workplace review
+ANALYSIS_STOPWORDS = frozenset({
+    "and","the","for","with","are","not","but","all","was","were","have","has","had",
+    "this","that","those","these","from","too","out","they","you","your","our","their",
+    "about","into","over","under","few","many","most","other","some","any","each","much",
+    "more","well","lot","lots","make","makes","very","just","really","every","also",
+    "can","could","would","should","use","used","work","working"
+})
+
+
+def tokenize(text) -> list:
+    #Lowercases a single cleaned cell, removes punctuation and splits it into words
+    return str(text).lower().translate(PUNCTUATION_TABLE).split()
+
+def count_words(texts, counts: Counter = None) -> Counter:
+    #Adds the words of every row to counts without joining all rows into one string
+    #Rows are tokenized in small blocks so the lowercase, punctuation and split steps run in C over many rows at a time
+    counts = Counter() if counts is None else counts
+    texts = iter(texts)
+    while True:
+        block = list(islice(texts, BLOCK_ROWS))
+        if not block:
+            return counts
+        counts.update(tokenize(" ".join(map(str, block))))
+
+def top_keywords(counts: Counter, n: int = 5, stopwords: frozenset = ANALYSIS_STOPWORDS) -> list:
+    #n most common alphabetic words that are not stopwords - ties keep the order words were first seen in
+    words = (item for item in counts.items() if item[0].isalpha() and item[0] not in stopwords)
+    return [w for w, _ in heapq.nlargest(n, words, key=itemgetter(1))] #Heap selection instead of sorting every word
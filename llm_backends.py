@@ -0,0 +1,178 @@
+#Importing Libraries
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+#Settings for calls made through ResilientBackend - can be overridden through environment variables
+LLM_DEADLINE = float(os.environ.get("THRIVE_LLM_TIMEOUT", "30")) #Seconds a call may take including retries
+LLM_MAX_RETRIES = int(os.environ.get("THRIVE_LLM_MAX_RETRIES", "2")) #Retries allowed for a single call
+LLM_RETRY_RATIO = float(os.environ.get("THRIVE_LLM_RETRY_RATIO", "0.2")) #Retries allowed as a share of all calls in this process
+LLM_BACKOFF = float(os.environ.get("THRIVE_LLM_BACKOFF", "0.5")) #Base delay in seconds before the first retry
+LLM_HEDGE = os.environ.get("THRIVE_LLM_HEDGE", "1") == "1" #Sends a duplicate request when the first one is slower than p95
+
+
+class LLMBackend:
+    #Interface every language model backend implements
+    name = "base"
+
+    @property
+    def model_id(self) -> str:
+        #Identifies the backend and model in cache keys so responses from different models are never mixed
+        return self.name
+
+    def generate(self, prompt: str, max_output_tokens: int = 150, timeout: float = None) -> str:
+        raise NotImplementedError
+
+
+class GeminiBackend(LLMBackend):
+    #Google Gemini backend - the client is configured on the first request instead of at import time
+    name = "gemini"
+
+    def __init__(self, api_key: str, model_name: str):
+        self.api_key = api_key
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model_id(self) -> str:
+        return f"gemini:{self.model_name}"
+
+    def _get_model(self):
+        with self._lock:
+            if self._model is None:
+                import google.generativeai as genai
+                genai.configure(api_key=self.api_key) #Configuring gemini
+                self._model = genai.GenerativeModel(self.model_name) #Setting type of model
+            return self._model
+
+    def generate(self, prompt: str, max_output_tokens: int = 150, timeout: float = None) -> str:
+        options = {"timeout": timeout} if timeout else None
+        response = self._get_model().generate_content(prompt, request_options=options) #Asks gemini the prompt and stores it's response
+        return response.text.strip()
+
+
+class StubBackend(LLMBackend):
+    #Deterministic offline backend - the same prompt always gets the same answer and no network is used
+    name = "stub"
+
+    def generate(self, prompt: str, max_output_tokens: int = 150, timeout: float = None) -> str:
+        tag = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        pros = re.search(r"^Pros: (\[.*\])$", prompt, re.MULTILINE)
+        cons = re.search(r"^Cons: (\[.*\])$", prompt, re.MULTILINE)
+        if pros and cons: #Batched description prompt expects a JSON object back
+            return json.dumps({
+                "pros": {kw: f"{kw} supports employee wellbeing in day to day work" for kw in json.loads(pros.group(1))},
+                "cons": {kw: f"{kw} affects employee wellbeing in day to day work" for kw in json.loads(cons.group(1))},
+            })
+        quoted = re.search(r"'([^']+)'", prompt)
+        subject = quoted.group(1) if quoted else "These themes"
+        return f"{subject} came up often in the reviews and shape how employees feel about their workplace (stub {tag})"
+
+
+def make_backend(name: str, api_key: str = "", model_name: str = "") -> LLMBackend:
+    if name == "gemini":
+        return GeminiBackend(api_key, model_name)
+    if name == "stub":
+        return StubBackend()
+    raise ValueError(f"Unknown LLM backend: {name}")
+
+
+class ResilientBackend(LLMBackend):
+    #Wraps a backend with a per-call deadline, a bounded retry budget with jittered backoff and hedged requests
+    MIN_HEDGE_SAMPLES = 20 #Latencies needed before p95 is trusted
+
+    def __init__(self, backend: LLMBackend, deadline: float = LLM_DEADLINE, max_retries: int = LLM_MAX_RETRIES,
+                 retry_ratio: float = LLM_RETRY_RATIO, backoff: float = LLM_BACKOFF, hedge: bool = LLM_HEDGE,
+                 max_workers: int = 16):
+        self.backend = backend
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.retry_ratio = retry_ratio
+        self.backoff = backoff
+        self.hedge = hedge
+        self.latencies = deque(maxlen=200) #Recent successful request latencies
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+        #Attempts run on their own pool so a hung request can be abandoned once the deadline passes
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{backend.name}-attempt")
+
+    @property
+    def name(self) -> str:
+        return self.backend.name
+
+    @property
+    def model_id(self) -> str:
+        return self.backend.model_id
+
+    def p95(self):
+        with self._lock:
+            if len(self.latencies) < self.MIN_HEDGE_SAMPLES:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def _timed(self, prompt, max_output_tokens, timeout):
+        start = time.monotonic()
+        text = self.backend.generate(prompt, max_output_tokens, timeout)
+        with self._lock:
+            self.latencies.append(time.monotonic() - start)
+        return text
+
+    def _attempt(self, prompt, max_output_tokens, remaining):
+        futures = [self._pool.submit(self._timed, prompt, max_output_tokens, remaining)]
+        hedge_after = self.p95() if self.hedge else None
+        end = time.monotonic() + remaining
+        if hedge_after is not None and hedge_after < remaining:
+            done, _ = wait(futures, timeout=hedge_after)
+            if not done: #Slower than p95, a duplicate request usually finishes first
+                with self._lock:
+                    self.hedges += 1
+                futures.append(self._pool.submit(self._timed, prompt, max_output_tokens, end - time.monotonic()))
+        error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=max(0, end - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        if error is not None:
+            raise error
+        raise TimeoutError(f"{self.name} request exceeded {self.deadline:.0f}s deadline")
+
+    def _may_retry(self, attempt: int) -> bool:
+        with self._lock:
+            if attempt >= self.max_retries or self.retries >= 1 + self.retry_ratio * self.calls:
+                return False #Retry budget spent - stops retries from multiplying load during an outage
+            self.retries += 1
+            return True
+
+    def generate(self, prompt: str, max_output_tokens: int = 150, timeout: float = None) -> str:
+        with self._lock:
+            self.calls += 1
+        end = time.monotonic() + (timeout or self.deadline)
+        attempt = 0
+        while True:
+            remaining = end - time.monotonic()
+            try:
+                return self._attempt(prompt, max_output_tokens, remaining)
+            except Exception:
+                delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5) #Jittered exponential backoff
+                if end - time.monotonic() <= delay or not self._may_retry(attempt):
+                    raise
+                time.sleep(delay)
+                attempt += 1
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "retries": self.retries, "hedges": self.hedges, "p95": self.p95()}
@@ -0,0 +1,136 @@
+#Importing Libraries
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import Counter
+from sqlite_local import LocalSqlite
+
+#Settings for the on-disk gemini response cache - can be overridden through environment variables
+LLM_CACHE_PATH = os.environ.get("THRIVE_LLM_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "llm_cache.sqlite3"))
+LLM_CACHE_TTL = float(os.environ.get("THRIVE_LLM_CACHE_TTL_DAYS", "30")) * 24 * 60 * 60 #Seconds a response stays valid
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("THRIVE_LLM_CACHE_MAX_ENTRIES", "50000"))
+LLM_CACHE_BYPASS = os.environ.get("THRIVE_LLM_CACHE_BYPASS", "0") == "1" #Skips the cache entirely, e.g. to force fresh responses
+LLM_CACHE_TOUCH_INTERVAL = float(os.environ.get("THRIVE_LLM_CACHE_TOUCH_MINUTES", "60")) * 60 #Seconds before a hit updates the entry's last used time again
+LLM_CACHE_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)",
+    "CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+]
+
+
+class LLMCache:
+    #SQLite backed cache of gemini responses keyed by model, prompt and generation settings
+    #One file shared by every gunicorn worker, opened through LocalSqlite
+    EVICT_EVERY = 100 #Number of writes between size checks
+    FLUSH_EVERY = 100 #Lookups between writes of the hit and miss counters, they are also written with every put
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl: float = LLM_CACHE_TTL,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES, bypass: bool = LLM_CACHE_BYPASS,
+                 touch_interval: float = LLM_CACHE_TOUCH_INTERVAL):
+        self.path = path
+        self.ttl = ttl
+        self.touch_interval = touch_interval
+        self.max_entries = max_entries
+        self.bypass = bypass
+        self.hits = 0 #Counters for this process, shared totals are kept in the stats table
+        self.misses = 0
+        self._db = LocalSqlite(path, LLM_CACHE_SCHEMA)
+        self._writes = 0
+        self._unflushed = Counter() #Hits and misses not yet added to the stats table
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        return self._db.connect()
+
+    @staticmethod
+    def key(model_name: str, prompt: str, settings: dict = None) -> str:
+        payload = json.dumps([model_name, prompt, settings or {}], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _flush_counts(self):
+        #Adds this process's hits and misses since the last flush to the shared totals in one transaction
+        with self._lock:
+            counts, self._unflushed = self._unflushed, Counter()
+        if counts:
+            self._connect().execute(
+                "INSERT INTO stats (name, value) VALUES " + ", ".join(["(?, ?)"] * len(counts)) +
+                " ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                [v for item in counts.items() for v in item]
+            )
+
+    def get(self, key: str):
+        #Reads only, apart from an occasional last used time and counter flush - lookups from every worker never queue on the write lock
+        if self.bypass:
+            return None
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT response, accessed FROM responses WHERE key = ? AND created > ?", (key, now - self.ttl)
+        ).fetchone()
+        name = "misses" if row is None else "hits"
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            self._unflushed[name] += 1
+            flush = sum(self._unflushed.values()) >= self.FLUSH_EVERY
+        if flush:
+            self._flush_counts()
+        if row is None:
+            return None
+        if now - row[1] > self.touch_interval:
+            conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key)) #Marks entry as recently used, precise enough for LRU eviction
+        return row[0]
+
+    def put(self, key: str, response: str):
+        if self.bypass or not response:
+            return #Empty responses are not worth keeping
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, response, created, accessed) VALUES (?, ?, ?, ?)",
+            (key, response, now, now)
+        )
+        self._flush_counts()
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self.EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        #Drops expired responses, then the least recently used ones above max_entries
+        conn = self._connect()
+        conn.execute("DELETE FROM responses WHERE created <= ?", (time.time() - self.ttl,))
+        conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def clear(self):
+        with self._lock:
+            self._unflushed = Counter()
+        conn = self._connect()
+        conn.execute("DELETE FROM responses")
+        conn.execute("DELETE FROM stats")
+
+    def stats(self) -> dict:
+        self._flush_counts()
+        conn = self._connect()
+        totals = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+        entries = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "total_hits": totals.get("hits", 0), #Across every worker sharing the file
+            "total_misses": totals.get("misses", 0),
+        }
+
+
+llm_response_cache = LLMCache() #Shared by every gemini call in this process
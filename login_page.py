@@ -2,7 +2,7 @@
 from dash import html, dcc, Input, Output, State, no_update
 from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
-from firebase_admin import auth
+from firebase_client import firebase_auth
 
 def login_layout():
     return dbc.Container(
@@ -63,6 +63,7 @@ def register_callbacks(app):
         if not email or not password:
             return no_update, "Please enter both email and password." #Prevents login if either email or password isn't entered
 
+        auth = firebase_auth() #Initializes firebase on the first sign in
         try:
             auth.get_user_by_email(email) #Checks with Firebase Auth service to see if the email and password are correct 
             #try will fail and go to except if any line inside fails
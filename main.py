@@ -1,11 +1,21 @@
 #Script to Start FastAPI Backend - uvicorn main:app --reload --host 0.0.0.0 --port 8000
 #Import libraries
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
-import pandas as pd
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 import os
-from typing import List
+import json
+import asyncio
+import hashlib
+import threading
+import itertools
+import importlib.util
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 from uuid import uuid4
+from upload_catalog import CsvStats, SORT_COLUMNS, upload_catalog
+from columnar_store import to_columnar, csv_columns, iter_columns
 
 #Initialize FastAPI app
 app = FastAPI(
@@ -14,6 +24,103 @@ app = FastAPI(
 )
 UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "uploads") #Sets directory name where uplaoded CSVs are stored
 os.makedirs(UPLOAD_DIR, exist_ok=True) #Declares Directory
+UPLOAD_CHUNK = 1024 * 1024 #Bytes read from the request and written to disk at a time
+PARSE_WORKERS = int(os.environ.get("THRIVE_API_PARSE_WORKERS", "2")) #CSVs parsed at the same time, the rest wait their turn
+parse_pool = ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix="csv-parse") #Keeps pandas off the event loop
+STREAM_CHUNK_ROWS = int(os.environ.get("THRIVE_API_CHUNK_ROWS", "50000")) #Rows parsed and sent at a time, bounds server memory per request
+_catalog_lock = threading.Lock()
+_catalog_synced = {} #Upload directory -> its mtime when last reconciled with the catalog in this process
+MEDIA_TYPES = {"json": "application/json", "ndjson": "application/x-ndjson", "arrow": "application/vnd.apache.arrow.stream"}
+
+#Writes one chunk of an upload and adds it to the running hash and row count - runs in a worker thread so disk writes never block the event loop
+def write_chunk(f, stats, chunk):
+    f.write(chunk)
+    stats.update(chunk)
+
+#Reconciles the catalog with the upload directory whenever a file was added or removed since the last listing
+#Picks up older uploads and ones written or deleted by other processes, a stat is all it costs otherwise
+def sync_catalog():
+    with _catalog_lock:
+        mtime = os.stat(UPLOAD_DIR).st_mtime_ns
+        if _catalog_synced.get(UPLOAD_DIR) != mtime:
+            upload_catalog.sync(UPLOAD_DIR)
+            _catalog_synced[UPLOAD_DIR] = mtime
+
+#Reads the rows offset to offset + limit of the selected columns, one chunk of at most STREAM_CHUNK_ROWS rows at a time
+#Served from the memory mapped columnar copy of the csv, so rows before the page are skipped instead of parsed
+def csv_chunks(file_path, columns=None, offset=0, limit=None):
+    return iter_columns(file_path, columns, STREAM_CHUNK_ROWS, offset, limit)
+
+#Rows of a chunk as dictionaries, empty cells as null
+def chunk_records(chunk):
+    return chunk.astype(object).where(chunk.notna(), None).to_dict(orient="records")
+
+def dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+#Encodes the chunks as the {"columns", "records"} body of read_csv, streamed record by record
+def encode_json(chunks, columns):
+    yield f'{{"columns":{dumps(columns)},"records":['.encode("utf-8")
+    first = True
+    for chunk in chunks:
+        records = chunk_records(chunk)
+        if records:
+            yield (("" if first else ",") + ",".join(map(dumps, records))).encode("utf-8")
+            first = False
+    yield b"]}"
+
+#One JSON object per line
+def encode_ndjson(chunks, columns):
+    for chunk in chunks:
+        records = chunk_records(chunk)
+        if records:
+            yield ("\n".join(map(dumps, records)) + "\n").encode("utf-8")
+
+#Arrow IPC stream - the schema comes from the first chunk and later chunks are converted to it
+def encode_arrow(chunks, columns):
+    import pyarrow as pa #Optional dependency, only needed for format=arrow
+    buffer = BytesIO() #Drained after every batch, so only one chunk is ever buffered
+    writer = None
+    for chunk in chunks:
+        if writer is None:
+            empty = set(chunk.columns[chunk.isna().all()]) #Types of columns with no values yet are unknown, they are sent as text
+            schema = pa.schema([
+                pa.field(f.name, pa.string()) if f.name in empty else f
+                for f in pa.Schema.from_pandas(chunk, preserve_index=False)
+            ])
+            writer = pa.ipc.new_stream(buffer, schema)
+        if empty:
+            chunk = chunk.astype({c: "string" for c in empty}) #Missing values stay null
+        writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False, safe=False)) #Whole numbers that later chunks read as floats are converted back
+        yield drain(buffer)
+    if writer is None: #No rows - still a valid stream with the column names
+        writer = pa.ipc.new_stream(buffer, pa.schema([pa.field(c, pa.string()) for c in columns]))
+    writer.close()
+    yield drain(buffer)
+
+def drain(buffer):
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+ENCODERS = {"json": encode_json, "ndjson": encode_ndjson, "arrow": encode_arrow}
+
+#Entity tag of one representation of a file - changes when the file or the query changes
+def csv_etag(file_path, **params):
+    st = os.stat(file_path)
+    key = dumps({"size": st.st_size, "mtime": st.st_mtime_ns, **params})
+    return '"' + hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + '"'
+
+#Runs a blocking iterator in the bounded parse pool one item at a time, so streaming never blocks the event loop
+async def iterate_in_pool(iterator):
+    loop = asyncio.get_running_loop()
+    done = object()
+    while True:
+        item = await loop.run_in_executor(parse_pool, next, iterator, done)
+        if item is done:
+            return
+        yield item
 
 @app.post("/upload-csv") #Command to trigger upload_csv function - A function that adds the csv to uploads directory
 async def upload_csv(file: UploadFile = File(...)):
@@ -22,29 +129,77 @@ async def upload_csv(file: UploadFile = File(...)):
     unique_id = uuid4().hex #Setting unique id
     filename = f"{unique_id}_{file.filename}" #Setting filename for the uplaoded csv with unique id and original file name
     file_path = os.path.join(UPLOAD_DIR, filename) #Seting path of upload to the uploads folder
+    stats = CsvStats() #Content hash, size, rows and columns computed while the file is written
     try:
-        contents = await file.read() #Reads the file
         with open(file_path, "wb") as f: #Opens a new file with dynamic assignment to vairable f
-            f.write(contents) #Writes the contents of the file and file name to f
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK) #Reads the upload a chunk at a time instead of all at once
+                if not chunk:
+                    break
+                await run_in_threadpool(write_chunk, f, stats, chunk)
+        await run_in_threadpool(upload_catalog.add, filename, file.filename, stats) #Listed from the catalog from now on
+        await asyncio.get_running_loop().run_in_executor(parse_pool, to_columnar, file_path) #Parsed once here, later reads use the columnar copy
     except Exception as e: 
+        if os.path.exists(file_path):
+            os.remove(file_path) #No partial files left behind
         raise HTTPException(status_code=500, detail=f"Failed to save file: {e}") #Error message for other exception
 
-    return {"filename": filename} #returns the filename
+    return {"filename": filename, "sha256": stats.sha256, "bytes": stats.bytes, "rows": stats.rows, "columns": stats.columns} #returns the filename with its hash, size and detected columns
 
-@app.get("/csv-files") #Command to trigger list_csv_files - A function that gets all csvs from uploads directory
-async def list_csv_files():
-    files = [f for f in os.listdir(UPLOAD_DIR) if f.lower().endswith(".csv")] #Creating list of files from the uploads directory that are CSVs
-    return {"files": files} #Returns list of files
+@app.get("/csv-files") #Command to trigger list_csv_files - A function that lists uploaded csvs from the upload catalog
+async def list_csv_files(
+    sort: str = "uploaded", #uploaded, name, size or rows
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    q: Optional[str] = None, #Part of the original file name
+    sha256: Optional[str] = None, #Uploads with exactly this content
+    min_rows: Optional[int] = Query(None, ge=0),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000) #Every matching upload when not given, as before paging existed
+):
+    if sort not in SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Unknown sort key, use one of: {', '.join(SORT_COLUMNS)}.")
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(parse_pool, sync_catalog)
+    page = await loop.run_in_executor(parse_pool, lambda: upload_catalog.query(sort, order, q, sha256, min_rows, limit, offset)) #Indexed query, no directory scan
+    next_offset = offset + len(page["items"]) if offset + len(page["items"]) < page["total"] else None
+    return {"files": [i["filename"] for i in page["items"]], "items": page["items"], "total": page["total"], "next_offset": next_offset} #files kept for existing clients
 
 @app.get("/csv/{filename}") #Command to trigger read_csv - A function that gets a specfic csv from uploads directory
-async def read_csv(filename: str):
+async def read_csv(
+    filename: str,
+    request: Request,
+    offset: int = Query(0, ge=0), #First row returned
+    limit: Optional[int] = Query(None, ge=1), #Rows returned, all remaining rows when not given
+    columns: Optional[str] = None, #Comma separated column names, all columns when not given
+    format: str = "json" #json, ndjson or arrow
+):
     file_path = os.path.join(UPLOAD_DIR, filename) #assigns filepath of the argument to file_path
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="File not found.") #Error displayed if file doesn't exist
+    if format not in ENCODERS:
+        raise HTTPException(status_code=400, detail=f"Unknown format, use one of: {', '.join(ENCODERS)}.")
+    if format == "arrow" and importlib.util.find_spec("pyarrow") is None:
+        raise HTTPException(status_code=501, detail="Arrow output needs pyarrow installed on the server.")
+    selected = [c.strip() for c in columns.split(",") if c.strip()] if columns else None
+
+    #Unchanged file and query - the client's copy is still valid, nothing is read or serialized
+    etag = csv_etag(file_path, offset=offset, limit=limit, columns=selected, format=format)
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    loop = asyncio.get_running_loop()
     try:
-        df = pd.read_csv(file_path) #Uses pandas to read the csv
+        header = await loop.run_in_executor(parse_pool, csv_columns, file_path) #Converts uploads made before columnar copies existed
+        missing = [c for c in selected or [] if c not in header]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(missing)}")
+        chunks = csv_chunks(file_path, selected, offset, limit)
+        first = await loop.run_in_executor(parse_pool, next, chunks, None) #Parsing errors are reported before the response starts
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error reading CSV: {e}") #Error when pandas is not able to read the file
 
-    records = df.to_dict(orient="records") #Converts csv to JSON Dictionary for sentiment analysis with horizontal rows being records
-    return JSONResponse(content={"columns": df.columns.tolist(), "records": records}) #returns JSON dictionary version of the csv
+    chunks = itertools.chain([first] if first is not None else [], chunks)
+    body = ENCODERS[format](chunks, selected or header)
+    return StreamingResponse(iterate_in_pool(body), media_type=MEDIA_TYPES[format], headers={"ETag": etag}) #Streams the csv a chunk at a time
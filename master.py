@@ -1,20 +1,16 @@
 #Importing dash, dash_bootstrap and firbase libraries
 from dash import Dash, dcc, html, Input, Output
 import dash_bootstrap_components as dbc
-import firebase_admin
-from firebase_admin import credentials, firestore, storage
 
 #Importing functions from the different pages of the app
 from home_page import home_layout, register_callbacks as home_callbacks
 from generate_report import report_layout, register_callbacks as report_callbacks
 from login_page import login_layout, register_callbacks as login_callbacks
 from register_page import register_layout, register_callbacks as reg_callbacks
+from jobs import register_routes as job_routes
+from csv_upload import register_routes as upload_routes
 
-#Initializing Firebase Admin to the entire app
-cred = credentials.Certificate("firebase_key.json")
-firebase_admin.initialize_app(cred, {
-    'storageBucket': 'angaraithrive.firebasestorage.app'
-})
+#Firebase Admin is initialized on first use by firebase_client, so workers start without connecting to firebase
 
 app = Dash(
     __name__,
@@ -51,6 +47,8 @@ login_callbacks(app)
 reg_callbacks(app)
 home_callbacks(app)
 report_callbacks(app)
+job_routes(server) #GET /jobs/<id> reports the progress of queued report generations
+upload_routes(server) #POST /upload streams csvs to disk, dash only gets a handle
 
 
 #Running the app
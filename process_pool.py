@@ -0,0 +1,10 @@
+#Importing Libraries
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn" #Forking a process with grpc and pool threads running can deadlock the child
+
+
+def process_pool(max_workers: int = None) -> ProcessPoolExecutor:
+    #Process pool whose workers start from a clean interpreter instead of a fork of this process
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(POOL_START_METHOD))
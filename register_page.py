@@ -2,7 +2,7 @@
 from dash import html, dcc, Input, Output, State, no_update
 from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
-from firebase_admin import auth
+from firebase_client import firebase_auth
 
 def register_layout():
     return dbc.Container(
@@ -66,6 +66,7 @@ def register_callbacks(app):
         if password != confirm:
             return no_update, "Passwords do not match."
 
+        auth = firebase_auth() #Initializes firebase on the first sign in
         try:
             auth.create_user(email=email, password=password, display_name=name)
             loc = dcc.Location(
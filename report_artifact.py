@@ -0,0 +1,57 @@
+#Importing Libraries
+import json
+import numpy as np
+import pandas as pd
+
+from sentiment_analysis import analyze_report, analysis_settings, segment_columns
+from analysis_cache import result_cache
+from blob_cache import blob_cache
+from columnar_store import csv_columns
+
+ARTIFACT_VERSION = 1 #Bumped whenever the artifact layout changes
+
+
+def artifact_path(storage_path: str) -> str:
+    #Storage path of the aggregate artifact kept next to the report's csv
+    return f"{storage_path.rsplit('.', 1)[0]}.summary.json"
+
+def to_jsonable(value):
+    #Converts numpy numbers and non string dictionary keys so the artifact can be written as json
+    if isinstance(value, dict):
+        return {str(k): to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    return value
+
+def build_artifact(csv_path: str, report: dict = None) -> dict:
+    #Everything the report pages and pdf need - counts, percentages, segment tallies, keywords and gemini text - in a few kilobytes
+    columns = segment_columns(pd.DataFrame(columns=csv_columns(csv_path)))
+    return to_jsonable({
+        "version": ARTIFACT_VERSION,
+        "settings": list(analysis_settings()),
+        "segment_columns": columns,
+        "report": report if report is not None else analyze_report(csv_path)
+    })
+
+def artifact_current(artifact: dict) -> bool:
+    #False for artifacts written with an older layout or different analysis settings, which have to be rebuilt
+    return artifact.get("version") == ARTIFACT_VERSION and artifact.get("settings") == to_jsonable(list(analysis_settings()))
+
+def save_artifact(bucket, path: str, artifact: dict):
+    #Uploads the artifact and returns the object generation to record next to summary_path
+    blob = bucket.blob(path)
+    blob.upload_from_string(json.dumps(artifact), content_type='application/json')
+    result_cache.put(('artifact', path, blob.generation), artifact)
+    return blob.generation
+
+def load_artifact(bucket, path: str, generation=None) -> dict:
+    #A generation of an artifact never changes, so each one is downloaded once and kept in the local blob cache
+    #Keyed by generation too, so a copy rebuilt by another worker replaces the one cached here
+    return result_cache.get_or_compute(
+        ('artifact', path, generation),
+        lambda: json.loads(blob_cache.get_bytes(bucket.blob(path), generation))
+    )
@@ -0,0 +1,97 @@
+#Importing Libraries
+import os
+import threading
+from io import BytesIO
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from process_pool import process_pool
+
+CHART_WORKERS = int(os.environ.get("THRIVE_CHART_WORKERS", str(os.cpu_count() or 1))) #Processes rendering charts
+CHART_PARALLEL_MIN = int(os.environ.get("THRIVE_CHART_PARALLEL_MIN", "4")) #Fewer charts than this are rendered in the calling thread
+CHART_CACHE_ENTRIES = int(os.environ.get("THRIVE_CHART_CACHE_ENTRIES", "512")) #Rendered pngs kept in memory
+CHART_BACKEND = os.environ.get("THRIVE_CHART_BACKEND", "matplotlib") #Default pdf chart backend - "matplotlib" png or "reportlab" vector
+CHART_BACKENDS = ("matplotlib", "reportlab")
+
+_chart_cache = OrderedDict() #(values, title, labels, colors) -> png bytes, least recently used first
+_chart_cache_lock = threading.Lock()
+_chart_pool = None
+_chart_pool_lock = threading.Lock()
+
+
+def render_pie(values, title, labels, colors) -> bytes:
+    #Renders one pie chart to png bytes with its own figure, so charts can be drawn in parallel without pyplot's global state
+    from matplotlib.figure import Figure #Imported on first use so the vector backend never loads matplotlib
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(figsize=(6, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.pie(values, labels=labels, autopct='%1.1f%%', colors=colors, startangle=90)
+    ax.set_title(title)
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight')
+    return buffer.getvalue()
+
+def chart_pool() -> ProcessPoolExecutor:
+    #Process pool shared by every pdf build, created on first use
+    global _chart_pool
+    with _chart_pool_lock:
+        if _chart_pool is None:
+            _chart_pool = process_pool(CHART_WORKERS)
+        return _chart_pool
+
+def render_pies(charts, labels, colors) -> list:
+    #Renders (values, title) pairs to png bytes in the same order - charts already drawn with the same counts are reused
+    keys = [(tuple(values), title, tuple(labels), tuple(colors)) for values, title in charts]
+    with _chart_cache_lock:
+        pngs = {k: _chart_cache[k] for k in keys if k in _chart_cache}
+        for k in pngs:
+            _chart_cache.move_to_end(k)
+    missing = list(dict.fromkeys(k for k in keys if k not in pngs))
+    args = [(list(k[0]), k[1], list(labels), list(colors)) for k in missing]
+    if len(missing) >= CHART_PARALLEL_MIN and CHART_WORKERS > 1:
+        rendered = list(chart_pool().map(render_pie, *zip(*args)))
+    else:
+        rendered = [render_pie(*a) for a in args]
+    with _chart_cache_lock:
+        for k, png in zip(missing, rendered):
+            pngs[k] = png
+            _chart_cache[k] = png
+        while len(_chart_cache) > CHART_CACHE_ENTRIES:
+            _chart_cache.popitem(last=False)
+    return [pngs[k] for k in keys]
+
+def pie_drawing(values, title, labels, colors, size: int = 400):
+    #Sentiment pie drawn with reportlab's own shapes - stays vector in the pdf and needs no rasterizing
+    from reportlab.graphics.shapes import Drawing, String
+    from reportlab.graphics.charts.piecharts import Pie
+    from reportlab.lib.colors import HexColor
+    drawing = Drawing(size, size)
+    drawing.add(String(size / 2, size - 24, title, textAnchor='middle', fontName='Helvetica', fontSize=14))
+    total = sum(values)
+    if not total:
+        drawing.add(String(size / 2, size / 2, "No reviews", textAnchor='middle', fontName='Helvetica', fontSize=12))
+        return drawing
+    shown = [i for i, v in enumerate(values) if v] #Empty sentiments would stack their labels on top of each other
+    pie = Pie()
+    pie.x, pie.y = size * 0.2, size * 0.12
+    pie.width = pie.height = size * 0.6
+    pie.data = [values[i] for i in shown]
+    pie.labels = [f"{labels[i]} {values[i] / total:.1%}" for i in shown]
+    pie.startAngle = 90 #Same orientation as the matplotlib charts
+    pie.direction = 'anticlockwise'
+    pie.slices.strokeColor = HexColor('#FFFFFF')
+    pie.slices.fontName = 'Helvetica'
+    pie.slices.fontSize = 10
+    for n, i in enumerate(shown):
+        pie.slices[n].fillColor = HexColor(colors[i])
+    drawing.add(pie)
+    return drawing
+
+def chart_flowables(charts, labels, colors, backend: str = CHART_BACKEND) -> list:
+    #Reportlab flowables for (values, title) pairs - vector drawings, or matplotlib pngs rendered in parallel
+    if backend not in CHART_BACKENDS:
+        raise ValueError(f"Unknown chart backend: {backend}")
+    if backend == "reportlab":
+        return [pie_drawing(values, title, labels, colors) for values, title in charts]
+    from reportlab.platypus import Image
+    return [Image(BytesIO(png), width=400, height=400) for png in render_pies(charts, labels, colors)]
@@ -0,0 +1,103 @@
+#Importing Libraries
+import os
+import time
+import threading
+from datetime import datetime
+from firebase_client import firestore_client
+
+PAGE_SIZE = int(os.environ.get("THRIVE_REPORTS_PAGE_SIZE", "20")) #Past report cards fetched per page
+LISTING_FIELDS = ["timestamp", "filename", "pdf_path"] #Only the fields a card shows are sent by firestore
+LEGACY_TIMESTAMP_FORMAT = "%Y-%m-%d_%H-%M-%S" #Format of timestamps stored as strings by older versions
+MIGRATION_BATCH = 400 #Firestore allows at most 500 writes per batch
+MIGRATION_RETRY = float(os.environ.get("THRIVE_MIGRATION_RETRY_SECONDS", "600")) #Wait after a failed migration before listings try it again
+
+_migrated = False #Set once this process has converted the string timestamps left by older versions
+_migration_retry_at = 0.0 #Monotonic time before which a failed migration is not tried again
+_migration_lock = threading.Lock()
+
+
+def listing_datetime(ts):
+    #Native timestamps and the "%Y-%m-%d_%H-%M-%S" strings of older reports as datetimes
+    if isinstance(ts, str):
+        try:
+            return datetime.strptime(ts, LEGACY_TIMESTAMP_FORMAT)
+        except ValueError:
+            return datetime.now() #Same fallback as report_datetime
+    return ts.to_datetime() if hasattr(ts, 'to_datetime') else ts
+
+def report_page(order: str = 'desc', cursor: dict = None, page_size: int = PAGE_SIZE):
+    #One page of past reports ordered by timestamp in firestore - returns (entries, cursor for the next page or None)
+    ensure_migrated()
+    db = firestore_client()
+    from firebase_admin import firestore
+    direction = firestore.Query.DESCENDING if order == 'desc' else firestore.Query.ASCENDING
+    query = (
+        db.collection("reports")
+          .select(LISTING_FIELDS)
+          .order_by("timestamp", direction=direction)
+          .order_by("__name__", direction=direction) #Document id breaks ties between reports with the same timestamp
+    )
+    if cursor:
+        query = query.start_after({
+            "timestamp": cursor.get("raw") or datetime.fromisoformat(cursor["timestamp"]), #Raw string when the page ended on an unmigrated report
+            "__name__": cursor["id"]
+        })
+    docs = list(query.limit(page_size + 1).stream()) #One extra document tells whether another page exists
+    entries = []
+    for doc in docs[:page_size]:
+        data = doc.to_dict()
+        ts = data.get("timestamp")
+        entries.append({
+            'id': doc.id,
+            'ts': listing_datetime(ts),
+            'raw_ts': ts if isinstance(ts, str) else None,
+            'filename': data.get("filename"),
+            'pdf_path': data.get("pdf_path") or "" #If path not available, it is blank
+        })
+    if len(docs) <= page_size:
+        return entries, None
+    last = entries[-1]
+    return entries, {"timestamp": last['ts'].isoformat(), "raw": last['raw_ts'], "id": last['id']} #Kept in a dcc.Store, so it has to be json
+
+def legacy_datetime(doc):
+    #Native timestamp for a report stored with a string one - malformed strings fall back to when the document was created
+    try:
+        return datetime.strptime(doc.get("timestamp"), LEGACY_TIMESTAMP_FORMAT)
+    except (ValueError, TypeError):
+        return getattr(doc, "create_time", None) or datetime.now()
+
+def migrate_string_timestamps() -> int:
+    #Rewrites timestamps stored as "%Y-%m-%d_%H-%M-%S" strings as native firestore timestamps
+    #Firestore orders every string after every timestamp, so the listing is only in date order once this has run
+    db = firestore_client()
+    query = db.collection("reports").where("timestamp", ">=", "").select(["timestamp"]) #Range filters only match values of the same type - strings here
+    migrated = 0
+    while True:
+        docs = list(query.limit(MIGRATION_BATCH).stream())
+        if not docs:
+            return migrated
+        batch = db.batch()
+        for doc in docs:
+            batch.update(doc.reference, {"timestamp": legacy_datetime(doc)}) #Parsed one at a time, a bad string cannot fail the batch
+        batch.commit()
+        migrated += len(docs)
+
+def ensure_migrated():
+    #Runs the timestamp migration once per process before reports are listed or the latest one is looked up
+    #Until it has succeeded, string timestamps sort after every native one and hide newer reports
+    global _migrated, _migration_retry_at
+    if _migrated or time.monotonic() < _migration_retry_at:
+        return
+    with _migration_lock:
+        if _migrated or time.monotonic() < _migration_retry_at:
+            return
+        try:
+            migrate_string_timestamps()
+            _migrated = True
+        except Exception:
+            _migration_retry_at = time.monotonic() + MIGRATION_RETRY #e.g. no write permission - string timestamps are still parsed for display meanwhile
+
+
+if __name__ == "__main__":
+    #One off migration for existing reports: python report_listing.py
+    print(f"Migrated {migrate_string_timestamps()} report timestamps")
@@ -0,0 +1,87 @@
+#Importing Libraries
+import os
+import time
+import threading
+from firebase_client import firestore_client
+from report_listing import ensure_migrated
+
+REPORT_META_TTL = float(os.environ.get("THRIVE_REPORT_META_TTL", "5")) #Seconds a polled result is reused when listeners are unavailable
+REPORT_META_LISTEN_TTL = float(os.environ.get("THRIVE_REPORT_META_LISTEN_TTL", "300")) #Seconds a result is reused while listening, in case the listener stops unnoticed
+
+
+class LatestReportCache:
+    #Process wide copy of the latest reports document
+    #A firestore snapshot listener keeps it current, so reads cost no round trip - polling with a short TTL is the fallback
+    def __init__(self, ttl: float = REPORT_META_TTL, listen_ttl: float = REPORT_META_LISTEN_TTL):
+        self.ttl = ttl
+        self.listen_ttl = listen_ttl
+        self._doc = None
+        self._loaded_at = None #None until the first result arrives
+        self._watch = None
+        self._listener_started = False
+        self._listener_failed = False
+        self._stale = False #Set by invalidate, forces one direct read
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def _query(self):
+        ensure_migrated() #Older string timestamps would otherwise sort above every new report
+        db = firestore_client()
+        from firebase_admin import firestore
+        return (
+            db.collection("reports")
+              .order_by("timestamp", direction=firestore.Query.DESCENDING)
+              .limit(1)
+        )
+
+    def _on_snapshot(self, docs, changes, read_time):
+        #Runs on the listener's thread whenever the latest report changes
+        with self._lock:
+            self._doc = docs[0] if docs else None
+            self._loaded_at = time.monotonic()
+            self._stale = False
+        self._ready.set()
+
+    def _start_listener(self):
+        try:
+            self._watch = self._query().on_snapshot(self._on_snapshot)
+        except Exception:
+            self._listener_failed = True #e.g. streaming blocked by a proxy - falls back to polling
+            return
+        self._ready.wait(timeout=10) #Initial snapshot normally arrives within one round trip
+
+    def listening(self) -> bool:
+        #The watch closes itself on errors it cannot retry, after that only polling sees other workers' reports
+        return self._watch is not None and self._watch.is_active and not self._listener_failed and self._loaded_at is not None
+
+    def get(self):
+        #Latest report document snapshot, None when there are no reports
+        with self._lock:
+            start = not self._listener_started
+            self._listener_started = True
+        if start:
+            self._start_listener()
+        with self._lock:
+            age = time.monotonic() - self._loaded_at if self._loaded_at is not None else None
+            fresh = age is not None and age < (self.listen_ttl if self.listening() else self.ttl)
+            if not self._stale and fresh:
+                return self._doc
+        doc = next(self._query().stream(), None)
+        with self._lock:
+            self._doc = doc
+            self._loaded_at = time.monotonic()
+            self._stale = False
+        return doc
+
+    def invalidate(self):
+        #Called after this process writes a report document so the next read sees the change even before the listener fires
+        with self._lock:
+            self._stale = True
+
+    def close(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+
+latest_report = LatestReportCache()
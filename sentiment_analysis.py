@@ -1,198 +1,572 @@
 #Importing Libraries
 import os
 import re
-import string
+import json
+import threading
+import importlib.util
+import numpy as np
 import pandas as pd
 from collections import Counter
-from bs4 import BeautifulSoup
-import google.generativeai as genai
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from keywords import ANALYSIS_STOPWORDS, count_words, top_keywords
+from llm_cache import llm_response_cache
+from llm_backends import make_backend, ResilientBackend
+from columnar_store import read_columns, iter_columns, csv_columns
+from process_pool import process_pool
 
 GOOGLE_API_KEY = "" #Declaring gemini API Key - To Be Filled In - Key exists, must be added to file
-genai.configure(api_key=GOOGLE_API_KEY) #Configuring gemini
-model = genai.GenerativeModel("gemini-1.5-flash") #Setting type of model
-chat = model.start_chat() #Creating new gemini chat
+MODEL_NAME = "gemini-1.5-flash" #Gemini model used for summaries and descriptions
+LLM_BACKEND = os.environ.get("THRIVE_LLM_BACKEND", "gemini") #"stub" gives deterministic offline responses
+TOP_N = 5 #Number of key pros and cons extracted per report
+BATCH_PROMPTS = os.environ.get("THRIVE_LLM_BATCH", "1") == "1" #Asks for all key pros and cons descriptions in one JSON request instead of one request per keyword
+PARALLEL_CLEAN_MIN = int(os.environ.get("THRIVE_PARALLEL_CLEAN_MIN", "20000")) #Distinct html cells needed before cleaning uses a process pool
+STREAM_MEMORY_MB = int(os.environ.get("THRIVE_STREAM_MEMORY_MB", "256")) #Memory budget for streaming analysis, csvs larger than this are analyzed in chunks
+SCHEMA_SAMPLE_ROWS = int(os.environ.get("THRIVE_SCHEMA_SAMPLE_ROWS", "1000")) #Rows read to pick column dtypes before the full parse
+TEXT_DTYPE = "string[pyarrow]" if importlib.util.find_spec("pyarrow") else "object" #Review text kept in arrow buffers instead of one python object per cell
+STREAM_COPIES = 4 #Working copies of a chunk alive at once while it is parsed, cleaned and tokenized
+LLM_MAX_CONCURRENCY = int(os.environ.get("THRIVE_LLM_CONCURRENCY", "8")) #Most gemini requests in flight at once per process
 
+_backend = None
+_backend_lock = threading.Lock()
+
+def llm_backend() -> ResilientBackend:
+    #Language model backend created on first use, with deadlines, retries and hedging around it
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = ResilientBackend(
+                make_backend(LLM_BACKEND, api_key=GOOGLE_API_KEY, model_name=MODEL_NAME),
+                max_workers=LLM_MAX_CONCURRENCY * 2 #Room for a hedged duplicate of every request in flight
+            )
+        return _backend
+
+def analysis_settings() -> tuple:
+    #Settings that change the output of analyze_reviews - used as part of result cache keys
+    return (llm_backend().model_id, TOP_N, BATCH_PROMPTS)
 
 def clean_html_text(html_text: str) -> str: #Converts html to string
     if not isinstance(html_text, str):
         return '' #If not html, returns null string
+    if '<' not in html_text and '&' not in html_text:
+        return html_text.strip() #No tags or entities, parsing would only strip surrounding whitespace
+    from bs4 import BeautifulSoup #Imported the first time a value actually contains markup
     return BeautifulSoup(html_text, 'lxml').get_text(separator=' ', strip=True)
 
+MISSING_TEXT = pd.Series([np.nan], dtype=object).astype(str).iloc[0] #What astype(str) turns a missing cell into in this pandas version
+
+_clean_pool = None
+_clean_pool_lock = threading.Lock()
+
+def clean_pool() -> ProcessPoolExecutor:
+    #Process pool shared by every text column that needs a lot of html parsed, created on first use
+    global _clean_pool
+    with _clean_pool_lock:
+        if _clean_pool is None:
+            _clean_pool = process_pool()
+        return _clean_pool
+
+def clean_text_column(values) -> pd.Series:
+    #Cleans a text column, parsing each distinct value once and spreading large amounts of markup over several processes
+    codes, uniques = pd.factorize(values, use_na_sentinel=True) #Arrow backed and categorical columns are factorized without a string copy per row
+    uniques = [str(u) for u in uniques] + [MISSING_TEXT] #Missing cells become the last unique, as astype(str) would render them
+    codes = np.where(codes < 0, len(uniques) - 1, codes)
+    markup = [i for i, u in enumerate(uniques) if isinstance(u, str) and ('<' in u or '&' in u)]
+    markup_set = set(markup)
+    cleaned = ['' if i in markup_set else clean_html_text(u) for i, u in enumerate(uniques)] #Plain text cells skip the html parser
+    if len(markup) >= PARALLEL_CLEAN_MIN and (os.cpu_count() or 1) > 1:
+        parsed = list(clean_pool().map(clean_html_text, [uniques[i] for i in markup], chunksize=1000))
+    else:
+        parsed = [clean_html_text(uniques[i]) for i in markup]
+    for i, text in zip(markup, parsed):
+        cleaned[i] = text
+    return pd.Series(np.asarray(cleaned, dtype=object)[codes], index=values.index)
+
 def call_gemini(prompt: str, max_output_tokens: int = 150) -> str:
     #Setting call gemini function, reiterating model
-    response = model.generate_content(prompt) #Asks gemini the prompt and stores it's response
-    return response.text.strip() #Returns response without trailing punctuation
+    backend = llm_backend()
+    key = llm_response_cache.key(backend.model_id, prompt, {"max_output_tokens": max_output_tokens})
+    cached = llm_response_cache.get(key) #Same prompt was already answered, e.g. a keyword shared by several departments
+    if cached is not None:
+        return cached
+    text = backend.generate(prompt, max_output_tokens) #Asks gemini the prompt, returns response without trailing whitespace
+    llm_response_cache.put(key, text)
+    return text
 
-def analyze_reviews(data_source, is_csv: bool = True) -> dict:
-    #is_csv is false for pandas dataframe and true in the case of CSVs
-    df = pd.read_csv(data_source) if is_csv else data_source.copy() #If it is a csv, creates dataframe for the csv, else copies the exisitng dataframe
-    
+_llm_pool = None
+_llm_pool_lock = threading.Lock()
+
+def llm_pool() -> ThreadPoolExecutor:
+    #Thread pool shared by all callbacks so the number of gemini requests in flight stays bounded
+    global _llm_pool
+    with _llm_pool_lock:
+        if _llm_pool is None:
+            _llm_pool = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="gemini")
+        return _llm_pool
+
+def call_gemini_many(prompts: list) -> list:
+    #Sends (prompt, max_output_tokens) pairs to gemini concurrently and returns the responses in the same order
+    #Identical prompts (the same keyword in different segments) are only sent once
+    unique = list(dict.fromkeys(prompts))
+    if len(unique) <= 1:
+        answers = {p: call_gemini(*p) for p in unique} #Nothing to overlap, avoids the thread hand-off
+    else:
+        futures = {p: llm_pool().submit(call_gemini, *p) for p in unique}
+        answers = {p: f.result() for p, f in futures.items()} #Raises the first failed request like the serial calls did
+    return [answers[p] for p in prompts]
+
+SENTIMENTS = ['Positive', 'Neutral', 'Negative']
+
+def find_columns(df) -> dict:
+    #Identifying relevant columns in the dataframe and storing them in a dictionary
     cols = {c.lower(): c for c in df.columns} #Lower case dictionary of all columns
-    #Identifying relevant columns in the dataframe and storing them in variables
-    
-    rating_col = next((cols[k] for k in cols if 'rating' in k), None)
-    pros_col   = next((cols[k] for k in cols if 'pros' in k), None)
-    cons_col   = next((cols[k] for k in cols if 'cons' in k), None)
-    comm_col   = next((cols[k] for k in cols if 'comment' in k or 'review' in k), None)
-    title_col  = next((cols[k] for k in cols if 'job' in k or 'role' in k or 'position' in k), None)
-    status_col = next((cols[k] for k in cols if 'status' in k or 'employment' in k), None)
-    dept_col   = next((cols[k] for k in cols if 'department' in k), None)
+    return {
+        'rating': next((cols[k] for k in cols if 'rating' in k), None),
+        'pros':   next((cols[k] for k in cols if 'pros' in k), None),
+        'cons':   next((cols[k] for k in cols if 'cons' in k), None),
+        'comment': next((cols[k] for k in cols if 'comment' in k or 'review' in k), None),
+        'title':  next((cols[k] for k in cols if 'job' in k or 'role' in k or 'position' in k), None),
+        'status': next((cols[k] for k in cols if 'status' in k or 'employment' in k), None),
+        'dept':   next((cols[k] for k in cols if 'department' in k), None),
+    }
+
+SENTIMENT_BINS = np.array(['Negative', 'Neutral', 'Positive'], dtype=object)
+
+def classify_sentiment(ratings) -> np.ndarray:
+    #Positive for ratings of 4 and above, Neutral for 3 and Negative otherwise - one comparison over the whole column
+    r = ratings.to_numpy()
+    return SENTIMENT_BINS[(r >= 4) * 2 + (r == 3)] #Index 0, 1 and 2 pick Negative, Neutral and Positive
+
+def map_unique(values, classify) -> np.ndarray:
+    #Classifies each distinct value once and broadcasts the labels back to every row
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    labels = np.asarray(classify(pd.Series(uniques, dtype=object).astype(str).str.lower()), dtype=object)
+    return labels[codes]
+
+#Different possible terms for current and former employees, compiled once
+CURRENT_PATTERN = re.compile(r'\b(?:current|present|active)\b')
+FORMER_PATTERN = re.compile(r'\b(?:former|past|previous|ex)\b')
+
+def classify_status(values) -> np.ndarray:
+    #Classifying employment status, Unknown if no mention of status is found
+    return map_unique(values, lambda u: np.select(
+        [u.str.contains(CURRENT_PATTERN), u.str.contains(FORMER_PATTERN)], ['Current', 'Former'], 'Unknown'
+    ))
+
+def map_dept(t: str) -> str:
+    #Guesses the department from a lower case job title
+    if 'hr' in t or 'human resources' in t:
+        return 'HR'
+    if any(k in t for k in ['it','engineer','software','developer','tech']):
+        return 'IT'
+    if 'admin' in t or 'assistant' in t or 'office' in t:
+        return 'Admin'
+    if 'sales' in t or 'account' in t:
+        return 'Sales'
+    if 'marketing' in t:
+        return 'Marketing'
+    if 'finance' in t or 'accounting' in t:
+        return 'Finance'
+    return 'Other'
+
+def map_departments(titles) -> np.ndarray:
+    #Department for every job title, each distinct title is only checked once
+    return map_unique(titles, lambda u: u.map(map_dept))
+
+def review_schema(path: str, segments: bool = False) -> tuple:
+    #Columns the analysis uses and the dtypes to parse them with, worked out from the header and a sample of rows
+    #segments adds the department and status columns analyze_report splits the report by
+    header = pd.DataFrame(columns=csv_columns(path))
+    c = find_columns(header)
+    needed = {col for col in c.values() if col}
+    if segments:
+        needed.update(col for col in segment_columns(header).values() if col)
+    columns = [col for col in header.columns if col in needed] #File order, so column detection picks the same columns again
+    if not columns:
+        return None, None #Nothing recognised, prepare_reviews reports which columns are missing
+    sample = pd.read_csv(path, usecols=columns, nrows=SCHEMA_SAMPLE_ROWS)
+    is_text = lambda col: not pd.api.types.is_numeric_dtype(sample[col]) and not pd.api.types.is_bool_dtype(sample[col])
+    dtype = {}
+    for key in ('pros', 'cons', 'comment'):
+        if c[key] and is_text(c[key]):
+            dtype[c[key]] = TEXT_DTYPE
+    for col in [c['title'], c['status'], c['dept']] + [col for col in columns if col not in c.values()]:
+        if col and is_text(col):
+            dtype[col] = 'category' #Few distinct values - job titles, departments and statuses
+    if c['rating'] and pd.api.types.is_numeric_dtype(sample[c['rating']]):
+        dtype[c['rating']] = 'float32' #Ratings are small numbers, float keeps missing ones as NaN
+    return columns, dtype
+
+def prepare_reviews(df):
+    #Cleans the dataframe and adds Sentiment, EmpStatus and Department columns - df is modified in place and returned
+    c = find_columns(df)
+    rating_col, title_col, status_col, dept_col = c['rating'], c['title'], c['status'], c['dept']
 
     if not rating_col:
         raise ValueError("No rating column found.") #If no rating found
-    if not ((pros_col and cons_col) or comm_col):
+    if not ((c['pros'] and c['cons']) or c['comment']):
         raise ValueError("Need pros/cons columns or review comments column.") #If no pros/cons column or review text found
 
-    for col in (pros_col, cons_col, comm_col): #Cleaning dataframe
+    for col in (c['pros'], c['cons'], c['comment']): #Cleaning dataframe
         if col:
-            df[col] = df[col].astype(str).apply(clean_html_text) #Removes any html elements from the columns
+            df[col] = clean_text_column(df[col]) #Removes any html elements from the columns
 
     df = df.dropna(subset=[rating_col]) #Removes records if the rating is null
     df[rating_col] = pd.to_numeric(df[rating_col], errors='coerce') #Converts ratings to integers
     df = df.dropna(subset=[rating_col]) #Repeats null record removal
 
-    df['Sentiment'] = df[rating_col].apply(lambda r: 'Positive' if r >= 4 else ('Neutral' if r == 3 else 'Negative')) #Classifies sentiment based on rating and stores in new sentiment column
-
-    #Classifying employment status
-    def classify_status(x):
-        x = str(x).lower()
-        if re.search(r'\b(current|present|active)\b', x): #different possible terms for current
-            return 'Current'
-        if re.search(r'\b(former|past|previous|ex)\b', x): #different possible terms for former
-            return 'Former'
-        return 'Unknown' #If no mention of status is found
-    df['EmpStatus'] = df[status_col].apply(classify_status) if status_col else 'Unknown' #Classifies employment status in a new column 
+    df['Sentiment'] = classify_sentiment(df[rating_col]) #Classifies sentiment based on rating and stores in new sentiment column
+    df['EmpStatus'] = classify_status(df[status_col]) if status_col else 'Unknown' #Classifies employment status in a new column 
 
     #Department classification
     if dept_col: #If there is a department column
         df['Department'] = df[dept_col].astype(str).replace('', 'Other')
     else: #If there is a job title column and no department column
-        def map_dept(title):
-            t = str(title).lower()
-            if 'hr' in t or 'human resources' in t:
-                return 'HR'
-            if any(k in t for k in ['it','engineer','software','developer','tech']):
-                return 'IT'
-            if 'admin' in t or 'assistant' in t or 'office' in t:
-                return 'Admin'
-            if 'sales' in t or 'account' in t:
-                return 'Sales'
-            if 'marketing' in t:
-                return 'Marketing'
-            if 'finance' in t or 'accounting' in t:
-                return 'Finance'
-            return 'Other'
-        df['Department'] = df[title_col].apply(map_dept) if title_col else 'Other' #Adds department column that stores classification
+        df['Department'] = map_departments(df[title_col]) if title_col else 'Other' #Adds department column that stores classification
+    return df, c
+
+def top_words_from_counts(counts: Counter, n: int = TOP_N) -> list:
+    #Picks the n most common workplace related words from a word counter
+    return top_keywords(counts, n, stopwords=ANALYSIS_STOPWORDS)
 
+def count_keywords(df, c, keys=None):
+    #Counts pros and cons words row by row into one counter per group - each row is tokenized once
+    #keys is a series of group labels aligned with df, None counts the whole dataframe as one group
+    groups = {None: np.arange(len(df))} if keys is None else keys.groupby(keys, sort=False, observed=True).indices #Rows with no segment value are left out
+    pros = {key: Counter() for key in groups}
+    cons = {key: Counter() for key in groups}
+    sources = []
+    #Pros and cons columns are counted before comments so ties keep the same order as the joined text
+    if c['pros']:
+        sources.append((pros, df[c['pros']].to_numpy(), None))
+    if c['cons']:
+        sources.append((cons, df[c['cons']].to_numpy(), None))
+    if c['comment']:
+        comments = df[c['comment']].to_numpy()
+        sentiment = df['Sentiment'].to_numpy()
+        sources.append((pros, comments, sentiment == 'Positive')) #Pros are with positive sentiment
+        sources.append((cons, comments, sentiment == 'Negative')) #Cons are with negative sentiment
+    for target, texts, mask in sources:
+        for key, rows in groups.items():
+            count_words(texts[rows if mask is None else rows[mask[rows]]], target[key])
+    return pros, cons
+
+def sentiment_tallies(df, by: str) -> dict:
+    #Gets number of reviews of each sentiment classification and total reviews for each value of the by column
+    table = df.groupby([by, 'Sentiment']).size().unstack(fill_value=0)
+    return {
+        key: {
+            'Positive': row.get('Positive', 0),
+            'Neutral':  row.get('Neutral', 0),
+            'Negative': row.get('Negative', 0),
+            'TotalReviews': int(row.sum())
+        }
+        for key, row in table.iterrows()
+    }
+
+def sentiment_breakdown(df) -> tuple:
     #Calculate overall sentiment and sentiment percentage distribution
     total_reviews = len(df) #Number of reviews
     counts = df['Sentiment'].value_counts().to_dict() #Converts sentiment values to dictionary
-    overall_counts = {s: counts.get(s, 0) for s in ['Positive', 'Neutral', 'Negative']} #Get's total sentiment count for each sentiment calssification
+    overall_counts = {s: counts.get(s, 0) for s in SENTIMENTS} #Get's total sentiment count for each sentiment calssification
     overall_percentages = {
         s: (overall_counts[s] / total_reviews * 100 if total_reviews else 0)
         for s in overall_counts
     } #calculates percentage of reviews having a sentiment
+    return overall_counts, overall_percentages
 
-    #Gets number of reviews of each sentiment classification and total reviews for each department and each job tenure
-    dept_sentiment = {
-        d: {
-            'Positive': g['Sentiment'].value_counts().get('Positive', 0),
-            'Neutral':  g['Sentiment'].value_counts().get('Neutral', 0),
-            'Negative': g['Sentiment'].value_counts().get('Negative', 0),
-            'TotalReviews': len(g)
-        }
-        for d, g in df.groupby('Department')
-    }
-    status_sentiment = {
-        s: {
-            'Positive': g['Sentiment'].value_counts().get('Positive', 0),
-            'Neutral':  g['Sentiment'].value_counts().get('Neutral', 0),
-            'Negative': g['Sentiment'].value_counts().get('Negative', 0),
-            'TotalReviews': len(g)
-        }
-        for s, g in df.groupby('EmpStatus')
-    }
-
-    #Combines all pros and cons, removing null values
-    pros_text = " ".join(df[pros_col].dropna()) if pros_col else ""
-    cons_text = " ".join(df[cons_col].dropna()) if cons_col else ""
-    if comm_col:
-        pros_text += " " + " ".join(df[df['Sentiment']=='Positive'][comm_col].dropna()) #Pros are with positive sentiment
-        cons_text += " " + " ".join(df[df['Sentiment']=='Negative'][comm_col].dropna()) #Cons are with negative sentiment
-
-    #Extracting common key words
-    def get_top_words(text, n=5):
-        txt = clean_html_text(text).lower()
-        txt = txt.translate(str.maketrans('', '', string.punctuation)) #removes punctuation
-        words = [w for w, _ in Counter(txt.split()).most_common(200)] #Counter library used to keep count of number of most common words found
-        stop = {
-            "and","the","for","with","are","not","but","all","was","were","have","has","had",
-            "this","that","those","these","from","too","out","they","you","your","our","their",
-            "about","into","over","under","few","many","most","other","some","any","each","much",
-            "more","well","lot","lots","make","makes","very","just","really","every","also",
-            "can","could","would","should","use","used","work","working"
-        } #Conjunctions, transitions, pronouns and other common words not related to the workplace review
-        return [w for w in words if w.isalpha() and w not in stop][:n] #Slices out and returns top n number of words
-
-    top_pros = get_top_words(pros_text, n=5) #Takes first 5 pros - 5 most common
-    top_cons = get_top_words(cons_text, n=5) #Takes first 5 pros - 5 most common
-
-    def list_to_text(lst):
-        #Converts list of python words to a sentence
-        if not lst:
-            return ""
-        if len(lst) == 1:
-            return lst[0]
-        if len(lst) == 2:
-            return f"{lst[0]} and {lst[1]}"
-        return ", ".join(lst[:-1]) + f", and {lst[-1]}"
+def list_to_text(lst):
+    #Converts list of python words to a sentence
+    if not lst:
+        return ""
+    if len(lst) == 1:
+        return lst[0]
+    if len(lst) == 2:
+        return f"{lst[0]} and {lst[1]}"
+    return ", ".join(lst[:-1]) + f", and {lst[-1]}"
 
+def summary_prompts(top_pros: list, top_cons: list) -> list:
+    #Lists the pros and cons summary prompts as (prompt, max_output_tokens) pairs
+    prompts = []
     #Generates summary for pros from the reviews using gemini
     if top_pros:
-        prompt = (
+        prompts.append((
             f"Employees often mention {list_to_text([w.capitalize() for w in top_pros])} as positive aspects of their workplace. "
-            "In about 60-70 words, write a detailed paragraph explaining the overall impact of these strengths on employee wellbeing and maintiaining a strong workplace culture."
-        )
-        pros_summary = call_gemini(prompt, max_output_tokens=100) #Calls gemini to answer the prompt and stores response
-    else:
-        pros_summary = "No positive aspects were highlighted."
-
+            "In about 60-70 words, write a detailed paragraph explaining the overall impact of these strengths on employee wellbeing and maintiaining a strong workplace culture.",
+            100
+        ))
     #Generates summary for cons from the reviews using gemini
     if top_cons:
-        prompt = (
+        prompts.append((
             f"Employees often mention {list_to_text([w.capitalize() for w in top_cons])} as negative aspects of their workplace. "
-            "In about 60-70 words, write a detailed paragraph explaining why these concerns are important to fix and how a fix could help improve employee wellbeing."
-        )
-        cons_summary = call_gemini(prompt, max_output_tokens=100)
-    else:
-        cons_summary = "No negative aspects were highlighted."
-
-    #Generating detailed sentences for the top 5 pros
-    key_pros = []
-    for kw in top_pros:
-        title = kw.capitalize()
-        prompt = f"In one sentence (about 25 words), explain why '{title}' helps benefit employees and their wellbeing while also explaining how it links to the workpalce directly."
-        desc = call_gemini(prompt, max_output_tokens=50).strip() 
-        desc = desc + '.' if desc else '' #Adds punctuation at the end
-        key_pros.append({"title": title, "description": desc}) #Adds the key pro and its description to the list of pros
-
-    #Generating detailed sentences for the top 5 pros
-    key_cons = []
-    for kw in top_cons:
-        title = kw.capitalize()
-        prompt = f"In one sentence (about 25 words), explain why '{title}' is a concern for employees and their wellbeing while also explaining how it links to the workpalce directly."
-        desc = call_gemini(prompt, max_output_tokens=50).strip()
-        desc = desc + '.' if desc else ''
-        key_cons.append({"title": title, "description": desc}) #Adds the key con and its description to the list of cons
-
-    #Returning all analysis results in a dictionary
+            "In about 60-70 words, write a detailed paragraph explaining why these concerns are important to fix and how a fix could help improve employee wellbeing.",
+            100
+        ))
+    return prompts
+
+def description_prompt(side: str, kw: str) -> tuple:
+    #One sentence description prompt for a single key pro or con
+    if side == 'pros':
+        return (f"In one sentence (about 25 words), explain why '{kw.capitalize()}' helps benefit employees and their wellbeing while also explaining how it links to the workpalce directly.", 50)
+    return (f"In one sentence (about 25 words), explain why '{kw.capitalize()}' is a concern for employees and their wellbeing while also explaining how it links to the workpalce directly.", 50)
+
+def batch_description_prompt(wanted: list) -> tuple:
+    #Single prompt asking for every key pro and con description at once as a JSON object
+    pros = [kw.capitalize() for side, kw in wanted if side == 'pros']
+    cons = [kw.capitalize() for side, kw in wanted if side == 'cons']
+    prompt = (
+        "For each workplace keyword below, write one sentence (about 25 words). "
+        "For pros, explain why it helps benefit employees and their wellbeing while also explaining how it links to the workplace directly. "
+        "For cons, explain why it is a concern for employees and their wellbeing while also explaining how it links to the workplace directly.\n"
+        f"Pros: {json.dumps(pros)}\n"
+        f"Cons: {json.dumps(cons)}\n"
+        'Respond with only a JSON object of the form {"pros": {"<keyword>": "<sentence>"}, "cons": {"<keyword>": "<sentence>"}} using every keyword exactly as written.'
+    )
+    return (prompt, 60 * len(wanted) + 50)
+
+def parse_batch_descriptions(text: str, wanted: list) -> dict:
+    #Validates a batched JSON response and returns {(side, keyword): description} for the entries it answered properly
+    start, end = text.find("{"), text.rfind("}") #Ignores markdown code fences or text gemini adds around the object
+    if start == -1 or end < start:
+        return {}
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    found = {}
+    for side, kw in wanted:
+        entries = data.get(side)
+        if not isinstance(entries, dict):
+            continue
+        entries = {str(k).strip().lower(): v for k, v in entries.items()}
+        desc = entries.get(kw.lower())
+        if isinstance(desc, str) and desc.strip():
+            found[(side, kw)] = desc.strip().rstrip('.') #fill_summaries adds the closing full stop
+    return found
+
+def fill_summaries(top_pros: list, top_cons: list, summaries: list, descriptions: dict) -> dict:
+    #Puts gemini summaries (in summary_prompts order) and {(side, keyword): description} into the result format
+    summaries = iter(summaries)
+    pros_summary = next(summaries) if top_pros else "No positive aspects were highlighted."
+    cons_summary = next(summaries) if top_cons else "No negative aspects were highlighted."
+
+    def describe(side, keywords):
+        items = []
+        for kw in keywords:
+            desc = descriptions.get((side, kw), '').strip()
+            desc = desc + '.' if desc else '' #Adds punctuation at the end
+            items.append({"title": kw.capitalize(), "description": desc}) #Adds the keyword and its description to the list
+        return items
+    key_pros = describe('pros', top_pros)
+    key_cons = describe('cons', top_cons)
+
     return {
-        "overall_sentiment_counts": overall_counts,
-        "overall_sentiment_percentages": overall_percentages,
-        "department_sentiment": dept_sentiment,
-        "status_sentiment": status_sentiment,
         "pros_summary": pros_summary,
         "cons_summary": cons_summary,
         "key_pros": key_pros,
         "key_cons": key_cons
     }
+
+def complete_descriptions(wanted: list, found: list):
+    #Re-asks once in JSON form for entries the batched response missed, then falls back to one prompt per keyword
+    pending = [(i, [w for w in ws if w not in found[i]]) for i, ws in enumerate(wanted)]
+    pending = [(i, missing) for i, missing in pending if missing]
+    if pending:
+        responses = call_gemini_many([batch_description_prompt(missing) for _, missing in pending])
+        for (i, missing), text in zip(pending, responses):
+            found[i].update(parse_batch_descriptions(text, missing))
+    pending = [(i, w) for i, ws in enumerate(wanted) for w in ws if w not in found[i]]
+    responses = call_gemini_many([description_prompt(*w) for _, w in pending])
+    for (i, w), text in zip(pending, responses):
+        found[i][w] = text
+
+def summarize_results(results: list) -> list:
+    #Adds gemini summaries to every result dictionary, sending the prompts of all results together
+    prompts = [summary_prompts(r['top_pros'], r['top_cons']) for r in results]
+    summaries_flat = [p for group in prompts for p in group]
+    wanted = [[('pros', kw) for kw in r['top_pros']] + [('cons', kw) for kw in r['top_cons']] for r in results]
+    if BATCH_PROMPTS:
+        asked = [(i, ws) for i, ws in enumerate(wanted) if ws] #One JSON request per result
+        description_prompts = [batch_description_prompt(ws) for _, ws in asked]
+    else:
+        asked = [(i, w) for i, ws in enumerate(wanted) for w in ws] #One request per keyword
+        description_prompts = [description_prompt(*w) for _, w in asked]
+
+    responses = call_gemini_many(summaries_flat + description_prompts) #Summaries and descriptions are in flight together
+    summaries, described = responses[:len(summaries_flat)], responses[len(summaries_flat):]
+    found = [{} for _ in results]
+    for (i, w), text in zip(asked, described):
+        if BATCH_PROMPTS:
+            found[i].update(parse_batch_descriptions(text, w))
+        else:
+            found[i][w] = text
+    if BATCH_PROMPTS:
+        complete_descriptions(wanted, found)
+
+    start = 0
+    for result, group, descriptions in zip(results, prompts, found):
+        result.update(fill_summaries(result['top_pros'], result['top_cons'], summaries[start:start + len(group)], descriptions))
+        start += len(group)
+    return results
+
+def summarize_keywords(top_pros: list, top_cons: list) -> dict:
+    #Generates pros and cons summaries plus key pros and cons descriptions for a single set of keywords
+    result = {'top_pros': top_pros, 'top_cons': top_cons}
+    summarize_results([result])
+    return {k: result[k] for k in ("pros_summary", "cons_summary", "key_pros", "key_cons")}
+
+def segment_stats(df, pros_counts: Counter, cons_counts: Counter) -> dict:
+    #Builds the result dictionary for one prepared dataframe (the whole report or a single segment), without gemini text
+    overall_counts, overall_percentages = sentiment_breakdown(df)
+    return {
+        "overall_sentiment_counts": overall_counts,
+        "overall_sentiment_percentages": overall_percentages,
+        "department_sentiment": sentiment_tallies(df, 'Department'),
+        "status_sentiment": sentiment_tallies(df, 'EmpStatus'),
+        "top_pros": top_words_from_counts(pros_counts or Counter()), #5 most common pros
+        "top_cons": top_words_from_counts(cons_counts or Counter()) #5 most common cons
+    }
+
+def analyze_reviews(data_source, is_csv: bool = True) -> dict:
+    #is_csv is false for pandas dataframe and true in the case of CSVs
+    if is_csv and should_stream(data_source):
+        return analyze_reviews_streaming(data_source)
+    df = read_columns(data_source, *review_schema(data_source)) if is_csv else data_source.copy() #If it is a csv, parses only the review columns, else copies the exisitng dataframe
+    df, c = prepare_reviews(df)
+    pros, cons = count_keywords(df, c)
+    return summarize_results([segment_stats(df, pros.get(None), cons.get(None))])[0] #Returning all analysis results in a dictionary
+
+class ReviewTotals:
+    #Running totals for streaming analysis - sentiment counts, department and status tallies and keyword counters
+    def __init__(self):
+        self.sentiments = Counter()
+        self.departments = {}
+        self.statuses = {}
+        #Column words and comment words are kept apart so the merged counters keep the same order as a full read
+        self.pros_words, self.cons_words = Counter(), Counter()
+        self.pros_comments, self.cons_comments = Counter(), Counter()
+
+    def add(self, df, c):
+        #Adds one prepared chunk
+        self.sentiments.update(df['Sentiment'].value_counts().to_dict())
+        for target, by in ((self.departments, 'Department'), (self.statuses, 'EmpStatus')):
+            for (key, sentiment), n in df.groupby([by, 'Sentiment']).size().items():
+                target.setdefault(key, Counter())[sentiment] += int(n)
+        pros, cons = count_keywords(df, dict(c, comment=None))
+        self.pros_words.update(pros.get(None, Counter()))
+        self.cons_words.update(cons.get(None, Counter()))
+        pros, cons = count_keywords(df, dict(c, pros=None, cons=None))
+        self.pros_comments.update(pros.get(None, Counter()))
+        self.cons_comments.update(cons.get(None, Counter()))
+
+    def stats(self) -> dict:
+        #Same dictionary segment_stats builds from a whole dataframe
+        total_reviews = sum(self.sentiments.values())
+        overall_counts = {s: self.sentiments.get(s, 0) for s in SENTIMENTS}
+        tallies = lambda groups: {
+            key: {**{s: groups[key].get(s, 0) for s in SENTIMENTS}, 'TotalReviews': sum(groups[key].values())}
+            for key in sorted(groups)
+        }
+        pros = self.pros_words.copy()
+        pros.update(self.pros_comments)
+        cons = self.cons_words.copy()
+        cons.update(self.cons_comments)
+        return {
+            "overall_sentiment_counts": overall_counts,
+            "overall_sentiment_percentages": {
+                s: (overall_counts[s] / total_reviews * 100 if total_reviews else 0) for s in overall_counts
+            },
+            "department_sentiment": tallies(self.departments),
+            "status_sentiment": tallies(self.statuses),
+            "top_pros": top_words_from_counts(pros),
+            "top_cons": top_words_from_counts(cons)
+        }
+
+def stream_chunk_rows(path: str, max_memory_mb: int = STREAM_MEMORY_MB, columns=None) -> int:
+    #Rows per chunk that keep a parsed and cleaned chunk within the memory budget, estimated from a sample of the file
+    sample = pd.read_csv(path, usecols=columns, nrows=1000)
+    if sample.empty:
+        return 1000
+    row_bytes = sample.memory_usage(deep=True).sum() / len(sample)
+    return max(1000, int(max_memory_mb * 1024 * 1024 / (row_bytes * STREAM_COPIES)))
+
+def should_stream(path: str, max_memory_mb: int = STREAM_MEMORY_MB) -> bool:
+    #Csvs larger than the memory budget are analyzed in chunks instead of loaded whole
+    return os.path.getsize(path) > max_memory_mb * 1024 * 1024
+
+def stream_totals(path: str, segments: bool = False, max_memory_mb: int = STREAM_MEMORY_MB, chunksize: int = None) -> tuple:
+    #Folds a csv into running totals one chunk at a time - returns (totals, {"departments": {value: totals}, "statuses": {...}})
+    header = pd.DataFrame(columns=csv_columns(path))
+    prepare_reviews(header.copy()) #Raises the same missing column errors as a full read, even for an empty file
+    columns, dtype = review_schema(path, segments)
+    seg_cols = segment_columns(header) if segments else {}
+    seg_keys = {name: f"__segment_{i}" for i, name in enumerate(seg_cols)} #Same helper columns as analyze_report
+    totals = ReviewTotals()
+    seg_totals = {name: {} for name in seg_cols}
+    for chunk in iter_columns(path, columns, chunksize or stream_chunk_rows(path, max_memory_mb, columns), dtype=dtype):
+        for name, col in seg_cols.items():
+            if col:
+                for value in chunk[col].dropna().unique():
+                    seg_totals[name].setdefault(value, ReviewTotals()) #Before rows without ratings are dropped, so every segment still gets a page
+                chunk[seg_keys[name]] = chunk[col]
+        chunk, c = prepare_reviews(chunk)
+        totals.add(chunk, c)
+        for name, col in seg_cols.items():
+            if col:
+                for value, group in chunk.groupby(seg_keys[name], observed=True):
+                    seg_totals[name][value].add(group, c)
+    return totals, seg_totals
+
+def analyze_reviews_streaming(path: str, max_memory_mb: int = STREAM_MEMORY_MB, chunksize: int = None) -> dict:
+    #Analyzes a csv in chunks so memory stays under max_memory_mb however large the export is - returns the analyze_reviews dictionary
+    totals, _ = stream_totals(path, False, max_memory_mb, chunksize)
+    return summarize_results([totals.stats()])[0]
+
+def analyze_report_streaming(path: str, max_memory_mb: int = STREAM_MEMORY_MB, chunksize: int = None) -> dict:
+    #analyze_report in chunks, with the report and every department and status kept as running totals
+    totals, seg_totals = stream_totals(path, True, max_memory_mb, chunksize)
+    report = {"overall": totals.stats()}
+    for name, values in seg_totals.items():
+        report[name] = {value: values[value].stats() for value in sorted(values)}
+    summarize_results([report["overall"]] + list(report["departments"].values()) + list(report["statuses"].values()))
+    return report
+
+def segment_columns(df) -> dict:
+    #Raw department and employment status columns that the report pages are split by
+    dept = [c for c in df.columns if 'dept' in c.lower() or 'department' in c.lower()]
+    status = [c for c in df.columns if 'status' in c.lower()]
+    return {'departments': dept[0] if dept else None, 'statuses': status[0] if status else None}
+
+def analyze_report(data_source, is_csv: bool = True) -> dict:
+    #Analyzes the whole report plus every department and every employment status in one pass over the data
+    #Returns {"overall": result, "departments": {value: result}, "statuses": {value: result}} with results shaped like analyze_reviews
+    if is_csv and should_stream(data_source):
+        return analyze_report_streaming(data_source) #Large exports never load whole
+    df = read_columns(data_source, *review_schema(data_source, segments=True)) if is_csv else data_source.copy()
+    seg_cols = segment_columns(df)
+    segment_values = {
+        name: sorted(df[col].dropna().unique()) if col else []
+        for name, col in seg_cols.items()
+    } #Taken before rows without ratings are dropped so every segment still gets a page
+    seg_keys = {name: f"__segment_{i}" for i, name in enumerate(seg_cols)} #Helper column names that column detection never matches
+    for name, col in seg_cols.items():
+        if col:
+            df[seg_keys[name]] = df[col] #Keeps raw segment values since cleaning may rewrite the column
+    df, c = prepare_reviews(df)
+
+    pros, cons = count_keywords(df, c)
+    report = {"overall": segment_stats(df, pros.get(None), cons.get(None))}
+    for name, col in seg_cols.items():
+        report[name] = {}
+        if not col:
+            continue
+        key_col = seg_keys[name]
+        groups = dict(tuple(df.groupby(key_col, observed=True))) #One groupby pass instead of filtering the frame per segment
+        seg_pros, seg_cons = count_keywords(df, c, df[key_col])
+        for value in segment_values[name]:
+            group = groups.get(value, df.iloc[0:0])
+            report[name][value] = segment_stats(group, seg_pros.get(value), seg_cons.get(value))
+    #Every prompt for the report and all of its segments is sent together
+    summarize_results([report["overall"]] + list(report["departments"].values()) + list(report["statuses"].values()))
+    return report
@@ -0,0 +1,30 @@
+#Importing Libraries
+import os
+import sqlite3
+import threading
+
+
+class LocalSqlite:
+    #One sqlite connection per thread to a database file shared by every worker process
+    #WAL mode and a busy timeout let several gunicorn workers read and write the same file safely
+    def __init__(self, path: str, schema: list, row_factory=None):
+        self.path = path
+        self.schema = schema #CREATE ... IF NOT EXISTS statements run on every new connection
+        self.row_factory = row_factory
+        self._local = threading.local() #sqlite connections cannot be shared between threads
+
+    def connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None) #Autocommit, each statement is its own transaction
+        if self.row_factory is not None:
+            conn.row_factory = self.row_factory
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in self.schema:
+            conn.execute(statement)
+        self._local.conn = conn
+        self._local.pid = os.getpid() #Connections are reopened after gunicorn forks a worker
+        return conn
@@ -0,0 +1,149 @@
+#Importing Libraries
+import os
+import csv
+import json
+import time
+import sqlite3
+import hashlib
+from sqlite_local import LocalSqlite
+
+#Settings for the catalog of uploaded csvs - can be overridden through environment variables
+UPLOAD_CATALOG_PATH = os.environ.get("THRIVE_UPLOAD_CATALOG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads", "catalog.sqlite3"))
+SORT_COLUMNS = {"uploaded": "uploaded", "name": "name", "size": "size", "rows": "rows"} #Sort keys accepted by query, all indexed
+HEADER_MAX_BYTES = 64 * 1024 #Longest header line kept for column detection
+UPLOAD_CATALOG_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS uploads (filename TEXT PRIMARY KEY, name TEXT NOT NULL, size INTEGER NOT NULL, "
+    "sha256 TEXT NOT NULL, rows INTEGER NOT NULL, columns TEXT NOT NULL, uploaded REAL NOT NULL)"
+] + [f"CREATE INDEX IF NOT EXISTS uploads_{column} ON uploads ({column}, filename)" for column in ("name", "size", "sha256", "rows", "uploaded")]
+
+
+class CsvStats:
+    #Running sha256, size, record count and header of a csv that is read or written one chunk at a time
+    def __init__(self):
+        self._hash = hashlib.sha256()
+        self.bytes = 0
+        self.records = 0 #Newlines outside quoted fields
+        self._quoted = False
+        self._last = b"\n"
+        self._header = b"" #Bytes up to the end of the first record
+        self._header_done = False
+
+    def update(self, data: bytes):
+        if not data:
+            return
+        self._hash.update(data)
+        self.bytes += len(data)
+        if not self._header_done:
+            self._header += data[:HEADER_MAX_BYTES]
+        if b'"' not in data and not self._quoted:
+            self.records += data.count(b"\n")
+        else:
+            #Quoted fields can contain newlines - only count the ones between closed quotes
+            for i, part in enumerate(data.split(b'"')):
+                if i:
+                    self._quoted = not self._quoted
+                if not self._quoted:
+                    self.records += part.count(b"\n")
+        self._header_done = self._header_done or self.records > 0 or len(self._header) >= HEADER_MAX_BYTES
+        self._last = data[-1:]
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    @property
+    def rows(self) -> int:
+        #Records after the header - the last line may lack a newline
+        return max(self.records + (self._last != b"\n") - 1, 0)
+
+    @property
+    def columns(self) -> list:
+        text = self._header.decode("utf-8-sig", errors="replace")
+        return next(csv.reader(text.splitlines() or [""]), [])
+
+
+def file_stats(path: str, chunk_size: int = 1024 * 1024) -> CsvStats:
+    #Stats of a csv already on disk, read in chunks
+    stats = CsvStats()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            stats.update(chunk)
+    return stats
+
+
+class UploadCatalog:
+    #SQLite catalog of uploaded csvs - name, size, hash, rows, columns and upload time of every file
+    #Listing queries the indexed table instead of scanning the upload directory and opening each file
+    def __init__(self, path: str = UPLOAD_CATALOG_PATH):
+        self.path = path
+        self._db = LocalSqlite(path, UPLOAD_CATALOG_SCHEMA, row_factory=sqlite3.Row)
+
+    def _connect(self) -> sqlite3.Connection:
+        return self._db.connect()
+
+    def add(self, filename: str, name: str, stats: CsvStats, uploaded: float = None):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO uploads (filename, name, size, sha256, rows, columns, uploaded) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (filename, name, stats.bytes, stats.sha256, stats.rows, json.dumps(stats.columns), uploaded or time.time())
+        )
+
+    def remove(self, filename: str):
+        self._connect().execute("DELETE FROM uploads WHERE filename = ?", (filename,))
+
+    @staticmethod
+    def _item(row) -> dict:
+        item = dict(row)
+        item["columns"] = json.loads(item["columns"])
+        return item
+
+    def get(self, filename: str):
+        row = self._connect().execute("SELECT * FROM uploads WHERE filename = ?", (filename,)).fetchone()
+        return self._item(row) if row is not None else None
+
+    def query(self, sort: str = "uploaded", order: str = "desc", name: str = None, sha256: str = None,
+              min_rows: int = None, limit: int = 100, offset: int = 0) -> dict:
+        #One page of uploads matching the filters, with the total number of matches - limit None returns every match from the offset on
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unknown sort key, use one of: {', '.join(SORT_COLUMNS)}")
+        direction = "ASC" if order == "asc" else "DESC"
+        where, params = [], []
+        if name:
+            where.append("name LIKE ? ESCAPE '\\'")
+            params.append("%" + name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        if sha256:
+            where.append("sha256 = ?")
+            params.append(sha256)
+        if min_rows is not None:
+            where.append("rows >= ?")
+            params.append(min_rows)
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+        conn = self._connect()
+        total = conn.execute(f"SELECT COUNT(*) FROM uploads{clause}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT * FROM uploads{clause} ORDER BY {SORT_COLUMNS[sort]} {direction}, filename {direction} LIMIT ? OFFSET ?",
+            params + [-1 if limit is None else limit, offset] #sqlite reads a negative limit as no limit
+        ).fetchall()
+        return {"total": total, "items": [self._item(r) for r in rows]}
+
+    def sync(self, upload_dir: str) -> int:
+        #Adds csvs on disk that are missing from the catalog, e.g. uploaded before it existed, and drops entries whose file is gone
+        conn = self._connect()
+        known = {r[0] for r in conn.execute("SELECT filename FROM uploads")}
+        on_disk = {f for f in os.listdir(upload_dir) if f.lower().endswith(".csv")}
+        for filename in on_disk - known:
+            path = os.path.join(upload_dir, filename)
+            name = filename.split("_", 1)[1] if "_" in filename else filename #Uploads are stored as <uuid>_<original name>
+            self.add(filename, name, file_stats(path), os.path.getmtime(path))
+        for filename in known - on_disk:
+            self.remove(filename)
+        return len(on_disk - known)
+
+
+upload_catalog = UploadCatalog() #Shared by every request in this process
+
+
+if __name__ == "__main__":
+    #One off backfill for csvs uploaded before the catalog existed: python upload_catalog.py [upload dir]
+    import sys
+    directory = sys.argv[1] if len(sys.argv) > 1 else os.path.dirname(UPLOAD_CATALOG_PATH)
+    print(f"Catalogued {upload_catalog.sync(directory)} uploads")